@@ -1,4 +1,5 @@
-import os
+from app.config.config import get_settings
+from app.utils.lazy_import import lazy_module, module_available
 
 SENTIMENT_NEGATIVE = ["بد", "ناراضی", "عصبانی"]
 SENTIMENT_POSITIVE = ["خوشحال", "راضی", "خوب"]
@@ -11,26 +12,24 @@ INTENT_KEYWORDS = {
 }
 
 # بارگذاری تنبل Transformer برای تحلیل احساسات دقیق (در صورت موجود بودن)
-_transformers_available = False
-try:
-	from transformers import pipeline  # type: ignore
-	_transformers_available = True
-except Exception:
-	_transformers_available = False
+transformers = lazy_module("transformers")
 
 _sentiment_pipeline = None
+_sentiment_model_name = None
 
 def _get_sentiment_pipeline():
-	global _sentiment_pipeline
-	if _sentiment_pipeline is None:
-		model_name = os.getenv("SENTIMENT_MODEL_NAME", "cardiffnlp/twitter-xlm-roberta-base-sentiment")
+	global _sentiment_pipeline, _sentiment_model_name
+	model_name = get_settings().sentiment.model_name
+	# با تغییر نام مدل در بارگذاری مجدد تنظیمات، pipeline دوباره ساخته می‌شود
+	if _sentiment_pipeline is None or _sentiment_model_name != model_name:
 		# pipeline به‌صورت پیش‌فرض CPU را استفاده می‌کند
-		_sentiment_pipeline = pipeline("sentiment-analysis", model=model_name)
+		_sentiment_pipeline = transformers.pipeline("sentiment-analysis", model=model_name)
+		_sentiment_model_name = model_name
 	return _sentiment_pipeline
 
 def detect_sentiment_hf(text: str) -> str:
 	"""تحلیل احساسات با مدل قوی چندزبانه. خروجی: positive/negative/neutral"""
-	if not _transformers_available:
+	if not module_available("transformers"):
 		raise RuntimeError("Transformers is not available")
 	pipe = _get_sentiment_pipeline()
 	# محدودیت طول برای کارایی
@@ -60,7 +59,7 @@ def detect_intent(text: str) -> str:
 	return "faq"  # fallback
 
 def analyze_text(transcript: str):
-	backend = os.getenv("SENTIMENT_BACKEND", "hybrid").lower()
+	backend = get_settings().sentiment.backend.lower()
 	if backend == "hf":
 		try:
 			sentiment = detect_sentiment_hf(transcript)
@@ -1,16 +1,23 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file, stream_with_context
 from app.database.db import get_db_connection, get_audio_path_by_unique_id
 from app.main import handle_processed_call
 from app.database.init_db import init_db
+from app.config.config import get_settings, reload_settings, install_sighup_handler, SettingsError
+import hmac
 import os
 import uuid
+import threading
 from werkzeug.utils import secure_filename
 from app.tts.tts_gemini import synthesize_tts
+from app.storage.audio_store import resolve_audio_path, guess_audio_mimetype, start_storage_worker
+from app.utils.resilience import breaker_stats
+from app.utils.lazy_import import module_available
+from app.database.export import iter_call_chunks, stream_csv_gz, stream_arrow
 
 app = Flask(__name__, template_folder='../templates')
 
 # تنظیمات آپلود فایل
-UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'storage/recordings')
+UPLOAD_FOLDER = get_settings().storage.upload_folder
 ALLOWED_EXTENSIONS = {'wav', 'mp3', 'm4a', 'flac', 'ogg'}
 # ریشه پروژه (یک سطح بالاتر از پوشه app)
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -22,11 +29,30 @@ if not os.path.exists(UPLOAD_FOLDER):
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max
 
+# بارگذاری مجدد تنظیمات با SIGHUP (kill -HUP <pid>)
+install_sighup_handler()
+
 def allowed_file(filename):
 	return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# اطمینان از آماده بودن دیتابیس
-init_db()
+_startup_lock = threading.Lock()
+_startup_done = False
+
+@app.before_request
+def _ensure_startup():
+	"""آماده‌سازی دیتابیس و worker نگهداری در اولین درخواست (نه هنگام import)"""
+	global _startup_done
+	if _startup_done:
+		return
+	with _startup_lock:
+		if _startup_done:
+			return
+		# اطمینان از آماده بودن دیتابیس
+		init_db()
+		# فشرده‌سازی و نگهداری دوره‌ای فایل‌های صوتی در پس‌زمینه
+		if get_settings().storage.worker:
+			start_storage_worker()
+		_startup_done = True
 
 @app.route("/")
 def index():
@@ -43,18 +69,19 @@ def index():
 
 @app.route('/play_audio/<unique_id>')
 def play_audio(unique_id):
-	audio_path = get_audio_path_by_unique_id(unique_id)
-	if not audio_path or not os.path.exists(audio_path):
+	audio_path = resolve_audio_path(get_audio_path_by_unique_id(unique_id))
+	if not audio_path:
 		return jsonify({'success': False, 'error': 'فایل صوتی موجود نیست'}), 404
-	return send_file(audio_path)
+	# conditional=True پاسخ‌های Range (206) را برای پخش تکه‌ای فعال می‌کند
+	return send_file(audio_path, mimetype=guess_audio_mimetype(audio_path), conditional=True, max_age=3600)
 
 
 @app.route('/download_audio/<unique_id>')
 def download_audio(unique_id):
-	audio_path = get_audio_path_by_unique_id(unique_id)
-	if not audio_path or not os.path.exists(audio_path):
+	audio_path = resolve_audio_path(get_audio_path_by_unique_id(unique_id))
+	if not audio_path:
 		return jsonify({'success': False, 'error': 'فایل صوتی موجود نیست'}), 404
-	return send_file(audio_path, as_attachment=True, download_name=os.path.basename(audio_path))
+	return send_file(audio_path, mimetype=guess_audio_mimetype(audio_path), as_attachment=True, download_name=os.path.basename(audio_path))
 
 @app.route("/process_audio", methods=['POST'])
 def process_audio():
@@ -123,6 +150,55 @@ def api_calls():
 	
 	return jsonify({'calls': calls_list, 'total': len(calls_list)})
 
+@app.route("/api/calls/export")
+def api_calls_export():
+	"""خروجی جریانی (streaming) از call_logs به‌صورت CSV فشرده یا Arrow
+
+	پارامترها: format=csv|arrow، since_id، since_created_at، chunk_size
+	"""
+	fmt = request.args.get('format', 'csv')
+	since_id = request.args.get('since_id', 0, type=int)
+	since_created_at = request.args.get('since_created_at')
+	chunk_size = min(max(request.args.get('chunk_size', 5000, type=int), 1), 50000)
+
+	if fmt == 'csv':
+		stream, mimetype, filename = stream_csv_gz, 'application/gzip', 'call_logs.csv.gz'
+	elif fmt == 'arrow':
+		if not module_available('pyarrow'):
+			return jsonify({'success': False, 'error': 'pyarrow نصب نشده است'}), 400
+		stream, mimetype, filename = stream_arrow, 'application/vnd.apache.arrow.stream', 'call_logs.arrows'
+	else:
+		return jsonify({'success': False, 'error': 'فرمت پشتیبانی نمی‌شود. فرمت‌های مجاز: csv, arrow'}), 400
+
+	chunks = iter_call_chunks(since_id, since_created_at, chunk_size)
+	return Response(
+		stream_with_context(stream(chunks)),
+		mimetype=mimetype,
+		headers={'Content-Disposition': f'attachment; filename={filename}'}
+	)
+
+@app.route("/admin/reload_config", methods=['POST'])
+def admin_reload_config():
+	"""بارگذاری مجدد تنظیمات بدون راه‌اندازی مجدد (نیاز به هدر X-Admin-Token)
+
+	فقط همین worker بلافاصله بارگذاری می‌شود؛ سایر workerها تغییر فایل‌های .env را
+	حداکثر پس از حدود یک ثانیه خودشان تشخیص می‌دهند.
+	"""
+	token = get_settings().admin_token
+	provided = request.headers.get('X-Admin-Token', '')
+	if not token or not hmac.compare_digest(provided.encode('utf-8'), token.encode('utf-8')):
+		return jsonify({'success': False, 'error': 'دسترسی غیرمجاز'}), 403
+	try:
+		changes = reload_settings()
+	except SettingsError as e:
+		return jsonify({'success': False, 'error': f'تنظیمات نامعتبر، تنظیمات قبلی حفظ شد: {e}'}), 400
+	return jsonify({'success': True, 'pid': os.getpid(), 'changes': {k: list(v) for k, v in changes.items()}})
+
+@app.route("/api/breakers")
+def api_breakers():
+	"""وضعیت circuit breakerها و تعداد درخواست‌های حذف‌شده (shed) برای پایش"""
+	return jsonify({'breakers': breaker_stats()})
+
 # مسیرهای مربوط به فایل صوتی حذف شده‌اند
 
 @app.route("/process_asterisk", methods=['POST'])
@@ -142,13 +218,14 @@ def process_asterisk():
 		if not filename:
 			return jsonify({'success': False, 'error': 'پارامتر filename الزامی است'}), 400
 
-		asterisk_dir = os.getenv('ASTERISK_MONITOR_DIR', '/app/asterisk-monitor')
+		asterisk_dir = get_settings().asterisk_monitor_dir
 		filepath = os.path.join(asterisk_dir, filename)
 
 		if not os.path.exists(filepath):
 			return jsonify({'success': False, 'error': f'فایل یافت نشد: {filename}'}), 404
 
-		result = handle_processed_call(filepath)
+		# ضبط‌های Asterisk دوطرفه‌اند (اپراتور + مشتری)
+		result = handle_processed_call(filepath, two_party=True)
 		return jsonify({'success': True, 'message': 'فایل با موفقیت پردازش شد', 'result': result})
 	except Exception as e:
 		return jsonify({'success': False, 'error': f'خطای سرور: {str(e)}'}), 500
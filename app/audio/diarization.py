@@ -0,0 +1,258 @@
+import os
+import tempfile
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from app.config.config import get_settings
+
+try:
+    import fcntl  # type: ignore
+    _fcntl_available = True
+except Exception:
+    _fcntl_available = False
+
+# جداسازی صدای مشتری از اپراتور در تماس‌های دوطرفه Asterisk (فقط CPU، بدون مدل سنگین)
+
+_FRAME_SEC = 0.025
+_HOP_SEC = 0.010
+_WINDOW_FRAMES = 50  # 0.5s per speaker-decision window
+_N_MELS = 24
+_N_CEPS = 13
+
+_cache_lock = threading.Lock()
+_agent_cache: Optional[np.ndarray] = None
+
+
+def customer_channel(input_path: str) -> Optional[int]:
+    """
+    Channel index holding the customer in a stereo monitor recording, or None for mono.
+    Asterisk MixMonitor stereo files put the received (caller) leg on the left by default.
+    """
+    try:
+        channels = sf.info(input_path).channels
+    except Exception:
+        return None
+    if channels < 2:
+        return None
+    channel = get_settings().diarization.customer_channel
+    return channel if channel < channels else None
+
+
+def _mel_filterbank(sr: int, n_fft: int) -> np.ndarray:
+    def hz_to_mel(f):
+        return 2595.0 * np.log10(1.0 + f / 700.0)
+
+    def mel_to_hz(m):
+        return 700.0 * (10.0 ** (m / 2595.0) - 1.0)
+
+    points = mel_to_hz(np.linspace(hz_to_mel(80.0), hz_to_mel(sr / 2.0), _N_MELS + 2))
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sr)
+    lower, center, upper = points[:-2, None], points[1:-1, None], points[2:, None]
+    rising = (bins[None, :] - lower) / (center - lower)
+    falling = (upper - bins[None, :]) / (upper - center)
+    return np.maximum(0.0, np.minimum(rising, falling))
+
+
+def _frame_features(audio: np.ndarray, sr: int) -> Tuple[np.ndarray, np.ndarray]:
+    """MFCC-like cepstra (c1..c12) and log energy per frame, fully vectorized."""
+    frame_len = int(_FRAME_SEC * sr)
+    hop = int(_HOP_SEC * sr)
+    if len(audio) < frame_len:
+        return np.zeros((0, _N_CEPS - 1)), np.zeros(0)
+    frames = np.lib.stride_tricks.sliding_window_view(audio, frame_len)[::hop]
+    frames = frames * np.hamming(frame_len)[None, :]
+
+    energy_db = 10.0 * np.log10(np.mean(np.square(frames), axis=1) + 1e-12)
+    n_fft = 1 << (frame_len - 1).bit_length()
+    power = np.square(np.abs(np.fft.rfft(frames, n=n_fft, axis=1)))
+    log_mel = np.log(power @ _mel_filterbank(sr, n_fft).T + 1e-10)
+
+    k = np.arange(_N_CEPS)[:, None]
+    n = np.arange(_N_MELS)[None, :]
+    dct = np.cos(np.pi * k * (2 * n + 1) / (2 * _N_MELS))
+    ceps = log_mel @ dct.T
+    return ceps[:, 1:], energy_db
+
+
+def _window_embeddings(ceps: np.ndarray, energy_db: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean cepstrum of voiced frames per 0.5s window; returns (embeddings, window start frames)."""
+    threshold = max(energy_db.max() - 35.0, np.percentile(energy_db, 40))
+    voiced = energy_db > threshold
+
+    n_windows = len(ceps) // _WINDOW_FRAMES
+    if n_windows == 0:
+        return np.zeros((0, ceps.shape[1])), np.zeros(0, dtype=int)
+    usable = n_windows * _WINDOW_FRAMES
+    c = ceps[:usable].reshape(n_windows, _WINDOW_FRAMES, -1)
+    v = voiced[:usable].reshape(n_windows, _WINDOW_FRAMES)
+
+    counts = v.sum(axis=1)
+    keep = counts >= 0.4 * _WINDOW_FRAMES
+    sums = (c * v[:, :, None]).sum(axis=1)
+    emb = sums[keep] / counts[keep, None]
+    starts = np.nonzero(keep)[0] * _WINDOW_FRAMES
+    return emb, starts
+
+
+def _kmeans2(x: np.ndarray, iterations: int = 20) -> np.ndarray:
+    first = int(np.argmax(np.linalg.norm(x - x.mean(axis=0), axis=1)))
+    second = int(np.argmax(np.linalg.norm(x - x[first], axis=1)))
+    centroids = x[[first, second]].copy()
+    labels = None
+    for _ in range(iterations):
+        dist = np.linalg.norm(x[:, None, :] - centroids[None, :, :], axis=2)
+        new_labels = np.argmin(dist, axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for k in (0, 1):
+            if np.any(labels == k):
+                centroids[k] = x[labels == k].mean(axis=0)
+    return labels
+
+
+def _smooth_labels(labels: np.ndarray) -> np.ndarray:
+    """Median filter of width 3 to drop single-window speaker flips."""
+    if len(labels) < 3:
+        return labels
+    padded = np.concatenate([labels[:1], labels, labels[-1:]])
+    stacked = np.stack([padded[:-2], padded[1:-1], padded[2:]])
+    return (stacked.sum(axis=0) >= 2).astype(int)
+
+
+def _cache_path() -> str:
+    return get_settings().diarization.cache_file
+
+
+def _read_cache_file(path: str) -> np.ndarray:
+    try:
+        return np.load(path)
+    except Exception:
+        return np.zeros((0, _N_CEPS - 1))
+
+
+def _load_agent_cache() -> np.ndarray:
+    global _agent_cache
+    with _cache_lock:
+        if _agent_cache is None:
+            _agent_cache = _read_cache_file(_cache_path())
+        return _agent_cache
+
+
+def _cosine_max(vec: np.ndarray, cache: np.ndarray) -> float:
+    if not len(cache):
+        return -1.0
+    a = vec / (np.linalg.norm(vec) + 1e-9)
+    b = cache / (np.linalg.norm(cache, axis=1, keepdims=True) + 1e-9)
+    return float((b @ a).max())
+
+
+def _remember_agent(centroid: np.ndarray) -> None:
+    """
+    Keep a bounded set of agent voice centroids so later calls can recognise the agent.
+    Voices already in the cache are skipped, so the file is only rewritten for a new agent.
+    """
+    global _agent_cache
+    cfg = get_settings().diarization
+    if _cosine_max(centroid, _load_agent_cache()) >= cfg.agent_match:
+        return
+
+    path = _cache_path()
+    directory = os.path.dirname(path) or "."
+    with _cache_lock:
+        lock_fh = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if _fcntl_available:
+                # workerهای دیگر هم می‌نویسند؛ نسخه روی دیسک خوانده و ادغام می‌شود
+                lock_fh = open(path + ".lock", "w")
+                fcntl.flock(lock_fh, fcntl.LOCK_EX)
+            cache = _read_cache_file(path)
+            if _cosine_max(centroid, cache) < cfg.agent_match:
+                cache = np.vstack([cache, centroid[None, :]])[-cfg.cache_size:]
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npy")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        np.save(f, cache)
+                    os.replace(tmp_path, path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            _agent_cache = cache
+        except Exception as e:
+            print(f"⚠️ خطا در ذخیره کش صدای اپراتور: {e}")
+        finally:
+            if lock_fh is not None:
+                lock_fh.close()
+
+
+def _agent_label(emb: np.ndarray, labels: np.ndarray) -> Tuple[int, str]:
+    centroids = np.stack([emb[labels == k].mean(axis=0) for k in (0, 1)])
+    cache = _load_agent_cache()
+    if len(cache):
+        a = centroids / (np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-9)
+        b = cache / (np.linalg.norm(cache, axis=1, keepdims=True) + 1e-9)
+        best = (a @ b.T).max(axis=1)
+        match = get_settings().diarization.agent_match
+        winner = int(np.argmax(best))
+        if best[winner] >= match and best[winner] - best[1 - winner] >= 0.02:
+            return winner, "cached"
+    # در تماس‌های ورودی اپراتور معمولاً اول صحبت می‌کند
+    agent = int(labels[0])
+    _remember_agent(centroids[agent])
+    return agent, "first_speaker"
+
+
+def isolate_customer(input_path: str) -> Tuple[Optional[str], dict]:
+    """
+    Cluster a mono two-party recording into two speakers and write only the customer's
+    speech to a temp wav. Returns (None, stats) when the call does not look two-party,
+    in which case the caller should keep using the full audio.
+    """
+    audio, sr = sf.read(input_path, dtype="float32", always_2d=False)
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    stats = {"method": "none", "total_sec": float(len(audio) / float(sr))}
+
+    ceps, energy_db = _frame_features(audio, sr)
+    if len(ceps) == 0:
+        return None, stats
+    emb, starts = _window_embeddings(ceps, energy_db)
+    if len(emb) < 4:
+        return None, stats
+
+    norm = (emb - emb.mean(axis=0)) / (emb.std(axis=0) + 1e-9)
+    labels = _smooth_labels(_kmeans2(norm))
+    if min(np.sum(labels == 0), np.sum(labels == 1)) < 2:
+        return None, stats
+
+    # جداپذیری دو خوشه؛ اگر کم باشد احتمالاً فقط یک گوینده داریم
+    c0, c1 = norm[labels == 0].mean(axis=0), norm[labels == 1].mean(axis=0)
+    spread = np.sqrt(0.5 * (norm[labels == 0].var(axis=0).sum() + norm[labels == 1].var(axis=0).sum())) + 1e-9
+    separation = float(np.linalg.norm(c0 - c1) / spread)
+    stats["separation"] = separation
+    if separation < get_settings().diarization.min_separation:
+        return None, stats
+
+    agent, how = _agent_label(emb, labels)
+    hop = int(_HOP_SEC * sr)
+    window_len = _WINDOW_FRAMES * hop
+    pieces: List[np.ndarray] = [
+        audio[s * hop:s * hop + window_len] for s, lab in zip(starts, labels) if lab != agent
+    ]
+    customer = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+    if len(customer) < sr:
+        return None, stats
+
+    fd, tmp_path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    sf.write(tmp_path, customer, sr)
+    stats.update({
+        "method": "cluster",
+        "agent_match": how,
+        "customer_sec": float(len(customer) / float(sr)),
+    })
+    return tmp_path, stats
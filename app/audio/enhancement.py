@@ -1,16 +1,15 @@
 import os
 import tempfile
-from typing import Tuple
+from typing import Optional, Tuple
 
 import numpy as np
 import soundfile as sf
-import librosa
 
-try:
-    import noisereduce as nr  # type: ignore
-    _nr_available = True
-except Exception:
-    _nr_available = False
+from app.config.config import get_settings
+from app.utils.lazy_import import lazy_module, module_available
+
+librosa = lazy_module("librosa")
+nr = lazy_module("noisereduce")
 
 
 def _normalize_loudness(audio: np.ndarray, target_db: float = -20.0) -> np.ndarray:
@@ -27,21 +26,28 @@ def _normalize_loudness(audio: np.ndarray, target_db: float = -20.0) -> np.ndarr
     return normalized
 
 
-def enhance_audio_file(input_path: str) -> Tuple[str, dict]:
+def enhance_audio_file(input_path: str, channel: Optional[int] = None) -> Tuple[str, dict]:
     """
     Enhance audio file by:
-      - resampling to 16k mono
+      - resampling to 16k mono (or keeping only *channel* of a multi-channel file)
       - spectral noise reduction (if available)
       - loudness normalization to target RMS dB
     Returns path to temp enhanced wav and stats.
     """
-    target_sr = int(os.getenv("AUDIO_TARGET_SR", "16000"))
-    target_db = float(os.getenv("AUDIO_TARGET_DB", "-20.0"))
-    enable_nr = os.getenv("AUDIO_NOISE_REDUCTION", "1") == "1"
+    cfg = get_settings().audio
+    target_sr = cfg.target_sr
+    target_db = cfg.target_db
+    enable_nr = cfg.noise_reduction
 
-    audio, sr = librosa.load(input_path, sr=target_sr, mono=True)
+    if channel is None:
+        audio, sr = librosa.load(input_path, sr=target_sr, mono=True)
+    else:
+        audio, sr = librosa.load(input_path, sr=target_sr, mono=False)
+        if audio.ndim > 1:
+            audio = audio[channel]
 
-    if enable_nr and _nr_available:
+    nr_available = enable_nr and module_available("noisereduce")
+    if nr_available:
         try:
             reduced = nr.reduce_noise(y=audio, sr=target_sr)
         except Exception:
@@ -58,7 +64,8 @@ def enhance_audio_file(input_path: str) -> Tuple[str, dict]:
     stats = {
         "sample_rate": target_sr,
         "duration_sec": float(len(enhanced) / float(target_sr)),
-        "noise_reduction": enable_nr and _nr_available,
-        "target_db": target_db
+        "noise_reduction": nr_available,
+        "target_db": target_db,
+        "channel": channel
     }
     return tmp_path, stats
@@ -1,16 +1,322 @@
 import os
-from dotenv import load_dotenv
+import signal
+import threading
+import time
+from dataclasses import dataclass, field, fields, is_dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple, get_type_hints
 
-# Load from project root .env if present
-load_dotenv()
-# Also attempt to load from app/config/.env for convenience
+from dotenv import load_dotenv, dotenv_values
+
+# محیط فرایند پیش از خواندن فایل‌های .env؛ در بارگذاری مجدد همین اولویت حفظ می‌شود
+_PROCESS_ENV = dict(os.environ)
+
+# app/config/.env is loaded first, so it takes precedence over the project root .env
 _this_dir = os.path.dirname(__file__)
 _config_env = os.path.join(_this_dir, '.env')
-if os.path.exists(_config_env):
-    load_dotenv(_config_env)
+_root_env = os.path.abspath(os.path.join(_this_dir, '..', '..', '.env'))
+for _path in (_config_env, _root_env):
+    if os.path.exists(_path):
+        load_dotenv(_path)
+
+
+class SettingsError(ValueError):
+    """One or more settings failed to parse or validate."""
+
+
+def _env(name: str, default: Any):
+    return field(default=default, metadata={"env": name})
+
+
+@dataclass(frozen=True)
+class WhisperSettings:
+    model: str = _env("WHISPER_MODEL", "medium")
+    fallback_model: str = _env("WHISPER_FALLBACK_MODEL", "medium")
+    preprocess: bool = _env("WHISPER_PREPROCESS", True)
+    language: str = _env("WHISPER_LANGUAGE", "fa")
+    beam_size: int = _env("WHISPER_BEAM_SIZE", 5)
+    best_of: int = _env("WHISPER_BEST_OF", 5)
+    condition_on_previous: bool = _env("WHISPER_CONDITION_ON_PREVIOUS", True)
+    compression_ratio: float = _env("WHISPER_COMPRESSION_RATIO", 2.4)
+    logprob_threshold: float = _env("WHISPER_LOGPROB_THRESHOLD", -1.0)
+    no_speech_threshold: float = _env("WHISPER_NO_SPEECH_THRESHOLD", 0.6)
+    initial_prompt: str = _env("WHISPER_INITIAL_PROMPT", "این یک مکالمه فارسی است")
+    try_large_on_low_conf: bool = _env("WHISPER_TRY_LARGE_ON_LOW_CONF", True)
+
+
+@dataclass(frozen=True)
+class AudioSettings:
+    target_sr: int = _env("AUDIO_TARGET_SR", 16000)
+    target_db: float = _env("AUDIO_TARGET_DB", -20.0)
+    noise_reduction: bool = _env("AUDIO_NOISE_REDUCTION", True)
+
+
+@dataclass(frozen=True)
+class DiarizationSettings:
+    enabled: bool = _env("DIARIZATION_ENABLED", True)
+    customer_channel: int = _env("DIARIZATION_CUSTOMER_CHANNEL", 0)
+    cache_file: str = _env("DIARIZATION_CACHE_FILE", "storage/agent_embeddings.npy")
+    cache_size: int = _env("DIARIZATION_CACHE_SIZE", 64)
+    agent_match: float = _env("DIARIZATION_AGENT_MATCH", 0.9)
+    min_separation: float = _env("DIARIZATION_MIN_SEPARATION", 1.0)
+
+
+@dataclass(frozen=True)
+class SentimentSettings:
+    backend: str = _env("SENTIMENT_BACKEND", "hybrid")
+    model_name: str = _env("SENTIMENT_MODEL_NAME", "cardiffnlp/twitter-xlm-roberta-base-sentiment")
+
+
+@dataclass(frozen=True)
+class GPTSettings:
+    api_key: Optional[str] = _env("METIS_API_KEY", None)
+    url: str = _env("METIS_API_URL", "https://api.metisai.ir/openai/v1/chat/completions")
+    model: str = _env("GPT_MODEL", "gpt-4.1-mini")
+    timeout_sec: float = _env("GPT_TIMEOUT_SEC", 30.0)
+    breaker_failures: int = _env("GPT_BREAKER_FAILURES", 5)
+    breaker_reset_sec: float = _env("GPT_BREAKER_RESET_SEC", 30.0)
+
+
+@dataclass(frozen=True)
+class TTSSettings:
+    enabled: bool = _env("ENABLE_TTS", False)
+    api_key: Optional[str] = _env("GEMINI_API_KEY", None)
+    base_url: Optional[str] = _env("GEMINI_BASE_URL", None)
+    model: str = _env("GEMINI_TTS_MODEL", "gemini-2.5-flash-preview-tts")
+    voice: str = _env("GEMINI_TTS_VOICE", "achernar")
+    lang: Optional[str] = _env("TTS_LANG", None)
+    timeout_sec: float = _env("TTS_TIMEOUT_SEC", 60.0)
+    breaker_failures: int = _env("TTS_BREAKER_FAILURES", 3)
+    breaker_reset_sec: float = _env("TTS_BREAKER_RESET_SEC", 60.0)
+
+
+@dataclass(frozen=True)
+class StorageSettings:
+    upload_folder: str = _env("UPLOAD_FOLDER", "storage/recordings")
+    responses_dir: str = _env("RESPONSES_DIR", "storage/responses")
+    worker: bool = _env("STORAGE_WORKER", False)
+    codec: str = _env("STORAGE_CODEC", "opus")
+    hot_hours: float = _env("STORAGE_HOT_HOURS", 24.0)
+    batch_size: int = _env("STORAGE_BATCH_SIZE", 50)
+    retention_days: float = _env("STORAGE_RETENTION_DAYS", 90.0)
+    max_mb: float = _env("STORAGE_MAX_MB", 0.0)
+    interval_sec: float = _env("STORAGE_INTERVAL_SEC", 600.0)
+    lock_file: str = _env("STORAGE_LOCK_FILE", "storage/.maintenance.lock")
+
+
+@dataclass(frozen=True)
+class Settings:
+    db_file: str = _env("DB_FILE", "call_logs.db")
+    asterisk_monitor_dir: str = _env("ASTERISK_MONITOR_DIR", "/app/asterisk-monitor")
+    admin_token: Optional[str] = _env("ADMIN_TOKEN", None)
+    # بودجه زمانی کل هر تماس (ثانیه)؛ 0 یعنی بدون محدودیت. پیش‌فرض خاموش است چون Whisper
+    # روی CPU به‌تنهایی می‌تواند بیشتر بودجه را مصرف کند و GPT/TTS را به پاسخ آماده بیندازد
+    call_deadline_sec: float = _env("CALL_DEADLINE_SEC", 0.0)
+    whisper: WhisperSettings = field(default_factory=WhisperSettings)
+    audio: AudioSettings = field(default_factory=AudioSettings)
+    diarization: DiarizationSettings = field(default_factory=DiarizationSettings)
+    sentiment: SentimentSettings = field(default_factory=SentimentSettings)
+    gpt: GPTSettings = field(default_factory=GPTSettings)
+    tts: TTSSettings = field(default_factory=TTSSettings)
+    storage: StorageSettings = field(default_factory=StorageSettings)
+
+
+_TRUE = {"1", "true", "yes", "on"}
+_FALSE = {"0", "false", "no", "off"}
+
+
+def _parse(raw: str, typ: Any) -> Any:
+    if typ is bool:
+        value = raw.strip().lower()
+        if value in _TRUE:
+            return True
+        if value in _FALSE:
+            return False
+        raise ValueError(f"expected 0/1, got {raw!r}")
+    if typ is int:
+        return int(raw)
+    if typ is float:
+        return float(raw)
+    return raw
+
+
+def _build(cls, env: Dict[str, str], errors: List[str]):
+    hints = get_type_hints(cls)
+    kwargs = {}
+    for f in fields(cls):
+        typ = hints[f.name]
+        if is_dataclass(typ):
+            kwargs[f.name] = _build(typ, env, errors)
+            continue
+        name = f.metadata["env"]
+        raw = env.get(name)
+        if raw is None or raw == "":
+            continue
+        # Optional[str] -> str
+        base = typ.__args__[0] if getattr(typ, "__args__", None) else typ
+        try:
+            kwargs[f.name] = _parse(raw, base)
+        except ValueError as e:
+            errors.append(f"{name}: {e}")
+    return cls(**kwargs)
+
+
+def _validate(s: Settings) -> List[str]:
+    errors = []
+    if s.whisper.beam_size < 1 or s.whisper.best_of < 1:
+        errors.append("WHISPER_BEAM_SIZE and WHISPER_BEST_OF must be >= 1")
+    if s.audio.target_sr <= 0:
+        errors.append("AUDIO_TARGET_SR must be positive")
+    if s.sentiment.backend.lower() not in ("hf", "hybrid", "keyword"):
+        errors.append("SENTIMENT_BACKEND must be one of hf, hybrid, keyword")
+    if s.storage.codec.lower() not in ("opus", "flac"):
+        errors.append("STORAGE_CODEC must be opus or flac")
+    if s.storage.batch_size < 1 or s.storage.interval_sec <= 0:
+        errors.append("STORAGE_BATCH_SIZE and STORAGE_INTERVAL_SEC must be positive")
+    if s.gpt.timeout_sec <= 0 or s.tts.timeout_sec <= 0:
+        errors.append("GPT_TIMEOUT_SEC and TTS_TIMEOUT_SEC must be positive")
+    if s.gpt.breaker_failures < 1 or s.tts.breaker_failures < 1:
+        errors.append("breaker failure thresholds must be >= 1")
+    if not 0.0 <= s.diarization.agent_match <= 1.0:
+        errors.append("DIARIZATION_AGENT_MATCH must be between 0 and 1")
+    if s.diarization.cache_size < 1:
+        errors.append("DIARIZATION_CACHE_SIZE must be >= 1")
+    if s.diarization.customer_channel < 0:
+        errors.append("DIARIZATION_CUSTOMER_CHANNEL must be >= 0")
+    return errors
+
+
+def _current_env() -> Dict[str, str]:
+    """Same precedence as at startup: process env > app/config/.env > root .env."""
+    env: Dict[str, str] = {}
+    for path in (_root_env, _config_env):
+        if os.path.exists(path):
+            env.update({k: v for k, v in dotenv_values(path).items() if v is not None})
+    env.update(_PROCESS_ENV)
+    return env
+
+
+def _env_files_signature() -> Tuple:
+    """(mtime_ns, size) of both .env files; a change means another process or an operator edited them."""
+    sig = []
+    for path in (_root_env, _config_env):
+        try:
+            st = os.stat(path)
+            sig.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append(None)
+    return tuple(sig)
+
+
+def load_settings(env: Optional[Dict[str, str]] = None) -> Settings:
+    errors: List[str] = []
+    settings = _build(Settings, _current_env() if env is None else env, errors)
+    errors.extend(_validate(settings))
+    if errors:
+        raise SettingsError("; ".join(errors))
+    return settings
+
+
+# هر worker گانیکورن نسخه خودش را دارد؛ با پایش .env همه workerها تغییر را می‌بینند
+_FILE_CHECK_INTERVAL_SEC = 1.0
+
+_files_signature = _env_files_signature()
+_settings = load_settings()
+_reload_lock = threading.Lock()
+_reload_callbacks: List[Callable[[Settings], None]] = []
+_next_file_check = time.monotonic() + _FILE_CHECK_INTERVAL_SEC
+_reload_requested = False
+
+
+def _reload_if_files_changed() -> None:
+    global _next_file_check, _reload_requested
+    if not _reload_lock.acquire(blocking=False):
+        return  # بارگذاری دیگری در جریان است
+    try:
+        _next_file_check = time.monotonic() + _FILE_CHECK_INTERVAL_SEC
+        requested, _reload_requested = _reload_requested, False
+        changed = requested or _env_files_signature() != _files_signature
+    finally:
+        _reload_lock.release()
+    if not changed:
+        return
+    try:
+        changes = reload_settings()
+        print(f"🔄 تنظیمات بارگذاری مجدد شد: {changes}")
+    except SettingsError as e:
+        print(f"❌ تنظیمات نامعتبر، تنظیمات قبلی حفظ شد: {e}")
+
+
+def get_settings() -> Settings:
+    """
+    Current settings snapshot; callers should read it once per operation.
+    At most once per second the .env files are checked, so an edit reaches every worker process.
+    """
+    if time.monotonic() >= _next_file_check:
+        _reload_if_files_changed()
+    return _settings
+
+
+def on_reload(callback: Callable[[Settings], None]) -> None:
+    _reload_callbacks.append(callback)
+
+
+def _flatten(obj: Any, prefix: str = "") -> Dict[str, Any]:
+    out = {}
+    for key, value in (asdict(obj) if is_dataclass(obj) else obj).items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(_flatten(value, name + "."))
+        else:
+            out[name] = value
+    return out
+
+
+def _mask(key: str, value: Any) -> Any:
+    return "***" if value and ("api_key" in key or "token" in key) else value
+
+
+def reload_settings() -> Dict[str, Tuple[Any, Any]]:
+    """
+    Re-read the environment and .env files and swap this process's settings snapshot in one step.
+    On validation errors the old snapshot stays active and SettingsError is raised.
+    Returns the changed keys as {key: (old, new)}; secrets are masked.
+    """
+    global _settings, _files_signature
+    with _reload_lock:
+        # امضا پیش از خواندن ثبت می‌شود تا فایل نامعتبر در هر بررسی دوباره خوانده نشود
+        _files_signature = _env_files_signature()
+        new = load_settings()
+        old, _settings = _settings, new
+    before, after = _flatten(old), _flatten(new)
+    changes = {k: (_mask(k, before[k]), _mask(k, after[k])) for k in after if before.get(k) != after[k]}
+    for callback in list(_reload_callbacks):
+        try:
+            callback(new)
+        except Exception as e:
+            print(f"⚠️ خطا در اعمال تنظیمات جدید: {e}")
+    return changes
+
+
+def install_sighup_handler() -> bool:
+    """
+    Reload settings on SIGHUP. Only possible from the main thread.
+    The handler only flags the reload; the next get_settings() call performs it, because the
+    signal may interrupt code holding a lock that the reload callbacks also take.
+    """
+    if not hasattr(signal, "SIGHUP") or threading.current_thread() is not threading.main_thread():
+        return False
+
+    def _handler(signum, frame):
+        global _reload_requested, _next_file_check
+        _reload_requested = True
+        _next_file_check = 0.0
+
+    signal.signal(signal.SIGHUP, _handler)
+    return True
+
 
-# تنظیمات اتصال به پایگاه داده SQLite
-DB_FILE = os.getenv("DB_FILE", "call_logs.db")
+# تنظیمات اتصال به پایگاه داده SQLite (تغییر آن نیاز به راه‌اندازی مجدد دارد)
+DB_FILE = _settings.db_file
 
 # تنظیمات API GPT
-GPT_API_KEY = os.getenv("METIS_API_KEY")
+GPT_API_KEY = _settings.gpt.api_key
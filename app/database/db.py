@@ -51,3 +51,50 @@ def get_audio_path_by_unique_id(unique_id: str):
         except Exception:
             return None
     return None
+
+
+def update_audio_response_path(old_path: str, new_path: str) -> bool:
+    """
+    جایگزینی مسیر فایل صوتی پاسخ در یک تراکنش (پس از فشرده‌سازی)
+    """
+    try:
+        conn = get_db_connection()
+        with conn:
+            conn.execute('UPDATE call_logs SET audio_response_path = ? WHERE audio_response_path = ?', (new_path, old_path))
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"❌ خطا در به‌روزرسانی مسیر فایل صوتی: {e}")
+        return False
+
+
+def clear_audio_response_path(path: str) -> bool:
+    try:
+        conn = get_db_connection()
+        with conn:
+            conn.execute('UPDATE call_logs SET audio_response_path = NULL WHERE audio_response_path = ?', (path,))
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"❌ خطا در پاک کردن مسیر فایل صوتی: {e}")
+        return False
+
+
+def update_call_analyses(results) -> int:
+    """
+    به‌روزرسانی گروهی نتایج پردازش مجدد در یک تراکنش
+    sentiment/intent بازنویسی می‌شوند؛ پاسخ جدید در draft_response ذخیره می‌شود تا
+    response، audio_response_path و gpt_quality (پاسخی که مشتری شنیده) با هم سازگار بمانند
+    results: لیست dict با کلیدهای id, sentiment, intent, response
+    """
+    conn = get_db_connection()
+    try:
+        with conn:
+            cursor = conn.executemany(
+                'UPDATE call_logs SET sentiment = ?, intent = ?, draft_response = ?, '
+                'reprocessed_at = CURRENT_TIMESTAMP WHERE id = ?',
+                [(r["sentiment"], r["intent"], r["response"], r["id"]) for r in results]
+            )
+        return cursor.rowcount
+    finally:
+        conn.close()
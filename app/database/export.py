@@ -0,0 +1,197 @@
+import csv
+import io
+import json
+import os
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.database.db import get_db_connection
+from app.utils.lazy_import import lazy_module, module_available
+
+pa = lazy_module("pyarrow")
+pq = lazy_module("pyarrow.parquet")
+pa_ipc = lazy_module("pyarrow.ipc")
+
+EXPORT_COLUMNS = [
+    "id", "unique_id", "sentiment", "intent", "response", "transcript",
+    "processing_time", "audio_response_path", "gpt_quality", "created_at",
+]
+EXPORT_FORMATS = ("csv", "parquet", "arrow")
+_CREATED_AT_INDEX = EXPORT_COLUMNS.index("created_at")
+
+
+def iter_call_chunks(since_id: int = 0,
+                     since_created_at: Optional[str] = None,
+                     chunk_size: int = 5000) -> Iterator[List[Tuple]]:
+    """
+    خواندن تکه‌تکه call_logs به ترتیب id (keyset pagination)
+    هر تکه یک کوئری جداگانه است، پس حافظه ثابت می‌ماند و تراکنش خواندن طولانی باز نمی‌ماند.
+    """
+    conn = get_db_connection()
+    try:
+        last_id = since_id
+        while True:
+            query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM call_logs WHERE id > ?"
+            params: list = [last_id]
+            if since_created_at:
+                query += " AND created_at > ?"
+                params.append(since_created_at)
+            query += " ORDER BY id LIMIT ?"
+            params.append(chunk_size)
+            rows = [tuple(r) for r in conn.execute(query, params).fetchall()]
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+    finally:
+        conn.close()
+
+
+def _arrow_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("unique_id", pa.string()),
+        ("sentiment", pa.string()),
+        ("intent", pa.string()),
+        ("response", pa.string()),
+        ("transcript", pa.string()),
+        ("processing_time", pa.float64()),
+        ("audio_response_path", pa.string()),
+        ("gpt_quality", pa.int64()),
+        ("created_at", pa.string()),
+    ])
+
+
+def _rows_to_batch(rows: List[Tuple], schema):
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def stream_csv_gz(chunks: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    """Yield a gzip-compressed CSV (header included) one chunk at a time."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        data = compressor.compress(buf.getvalue().encode("utf-8"))
+        buf.seek(0)
+        buf.truncate(0)
+        if data:
+            yield data
+    data = compressor.compress(buf.getvalue().encode("utf-8")) + compressor.flush()
+    if data:
+        yield data
+
+
+def stream_arrow(chunks: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    """Yield an Arrow IPC stream, one record batch per chunk."""
+    schema = _arrow_schema()
+    sink = io.BytesIO()
+    writer = pa_ipc.new_stream(sink, schema)
+    for rows in chunks:
+        writer.write_batch(_rows_to_batch(rows, schema))
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate(0)
+    writer.close()
+    yield sink.getvalue()
+
+
+def _write_parquet(path: str, chunks: Iterator[List[Tuple]]) -> None:
+    schema = _arrow_schema()
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for rows in chunks:
+            writer.write_batch(_rows_to_batch(rows, schema))
+
+
+def _tracking(chunks: Iterator[List[Tuple]], stats: Dict) -> Iterator[List[Tuple]]:
+    for rows in chunks:
+        stats["rows"] += len(rows)
+        stats["last_id"] = rows[-1][0]
+        stats["last_created_at"] = rows[-1][_CREATED_AT_INDEX]
+        yield rows
+
+
+def load_watermark(state_file: Optional[str]) -> Dict:
+    if state_file and os.path.exists(state_file):
+        with open(state_file, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_watermark(state_file: str, stats: Dict) -> None:
+    tmp_path = state_file + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"last_id": stats["last_id"], "last_created_at": stats["last_created_at"]}, f)
+    os.replace(tmp_path, state_file)
+
+
+def export_calls(out_path: str,
+                 fmt: str = "csv",
+                 since_id: Optional[int] = None,
+                 since_created_at: Optional[str] = None,
+                 chunk_size: int = 5000,
+                 state_file: Optional[str] = None) -> Dict:
+    """
+    Export call_logs to *out_path* as gzip CSV, Parquet or an Arrow IPC stream.
+    With *state_file* the export starts after the stored watermark and the
+    watermark is advanced only once the file is completely written. An
+    incremental run with no new rows leaves *out_path* untouched and returns
+    out_path=None, so the previous delta is not replaced by an empty file.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unsupported export format: {fmt}")
+    if fmt in ("parquet", "arrow") and not module_available("pyarrow"):
+        raise RuntimeError("pyarrow is required for parquet/arrow export")
+
+    watermark = load_watermark(state_file)
+    if since_id is None:
+        since_id = int(watermark.get("last_id", 0))
+    stats = {"rows": 0, "last_id": since_id, "last_created_at": watermark.get("last_created_at"), "format": fmt}
+    chunks = _tracking(iter_call_chunks(since_id, since_created_at, chunk_size), stats)
+
+    tmp_path = out_path + ".part"
+    try:
+        if fmt == "parquet":
+            _write_parquet(tmp_path, chunks)
+        else:
+            stream = stream_csv_gz(chunks) if fmt == "csv" else stream_arrow(chunks)
+            with open(tmp_path, "wb") as f:
+                for data in stream:
+                    f.write(data)
+        if state_file and not stats["rows"]:
+            stats["out_path"] = None
+            return stats
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    if state_file:
+        save_watermark(state_file, stats)
+    stats["out_path"] = out_path
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export call_logs to columnar/compressed files")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--since-id", type=int, default=None)
+    parser.add_argument("--since-created-at", default=None)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--state-file", default=None, help="JSON watermark for incremental exports")
+    args = parser.parse_args()
+
+    result = export_calls(args.out, args.format, args.since_id, args.since_created_at, args.chunk_size, args.state_file)
+    if result["out_path"] is None:
+        print(f"ℹ️ ردیف جدیدی برای خروجی وجود نداشت؛ فایل {args.out} تغییر نکرد")
+    else:
+        print(f"📦 خروجی گرفته شد: {result}")
@@ -23,7 +23,9 @@ def init_db():
                             processing_time REAL,
                             audio_response_path TEXT,
                             gpt_quality INTEGER,
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            draft_response TEXT,
+                            reprocessed_at TIMESTAMP)''')
         print("✅ جدول call_logs ایجاد شد (با ستون‌های audio_response_path و gpt_quality)")
     else:
         # افزودن ستون‌های جدید در صورت نبود
@@ -38,6 +40,15 @@ def init_db():
             conn.execute("ALTER TABLE call_logs ADD COLUMN gpt_quality INTEGER")
             print("✅ ستون gpt_quality اضافه شد")
 
+        # پاسخ پیش‌نویس پردازش گروهی؛ response (پاسخی که مشتری شنیده) دست نمی‌خورد
+        if 'draft_response' not in columns:
+            conn.execute("ALTER TABLE call_logs ADD COLUMN draft_response TEXT")
+            print("✅ ستون draft_response اضافه شد")
+
+        if 'reprocessed_at' not in columns:
+            conn.execute("ALTER TABLE call_logs ADD COLUMN reprocessed_at TIMESTAMP")
+            print("✅ ستون reprocessed_at اضافه شد")
+
     conn.commit()
     conn.close()
 
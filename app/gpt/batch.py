@@ -0,0 +1,250 @@
+"""
+Batch GPT mode for reprocessing historical calls.
+
+Two strategies:
+  - packed:     several transcripts per request, classified and answered as one JSON document
+  - concurrent: one request per transcript, several in flight under a requests/sec limit
+
+Finished items are appended to a JSONL checkpoint as they arrive, so an
+interrupted run resumes where it stopped. At the end of each run the newly
+finished results are written to call_logs in a single transaction and marked
+as written in the checkpoint; the next run only retries the unfinished calls.
+Drafted replies go to call_logs.draft_response (with reprocessed_at); the
+original response and its TTS audio and gpt_quality are left as they were.
+
+    python -m app.gpt.batch --mode packed --pack-size 8 --concurrency 2 --rps 1
+    python -m benchmarks.stub_servers --port 8089   # local stand-in; set METIS_API_URL accordingly
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from app.analysis.analysis import INTENT_KEYWORDS, analyze_text
+from app.database.db import get_db_connection, update_call_analyses
+from app.database.init_db import init_db
+from app.gpt.gpt_client import GPTError, chat_completion
+from app.utils.resilience import CircuitOpenError
+
+SENTIMENTS = ("positive", "negative", "neutral")
+INTENTS = tuple(INTENT_KEYWORDS) + ("faq",)
+
+_PACKED_SYSTEM_PROMPT = (
+    "شما دستیار مرکز تماس هستید. برای هر تماس در ورودی JSON، احساسات "
+    f"({', '.join(SENTIMENTS)})، نیت ({', '.join(INTENTS)}) و یک پاسخ کوتاه فارسی برای مشتری تعیین کنید. "
+    'خروجی فقط JSON به شکل {"results": [{"id": ..., "sentiment": ..., "intent": ..., "reply": ...}]} باشد.'
+)
+
+
+class _RateLimiter:
+    """Spaces request starts at least 1/rps seconds apart across threads."""
+
+    def __init__(self, rps: float):
+        self._interval = 1.0 / rps if rps > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self) -> None:
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self._interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def select_calls(since_id: int = 0, limit: Optional[int] = None, ids: Optional[List[int]] = None) -> List[Dict]:
+    conn = get_db_connection()
+    try:
+        query = "SELECT id, transcript FROM call_logs WHERE transcript IS NOT NULL AND transcript != ''"
+        params: list = []
+        if ids:
+            query += f" AND id IN ({', '.join('?' for _ in ids)})"
+            params.extend(ids)
+        else:
+            query += " AND id > ?"
+            params.append(since_id)
+        query += " ORDER BY id"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [{"id": r["id"], "transcript": r["transcript"]} for r in conn.execute(query, params).fetchall()]
+    finally:
+        conn.close()
+
+
+def _load_checkpoint(path: Optional[str]) -> Dict[int, Dict]:
+    """Finished items by id; a later {"id": ..., "written": true} line marks one as already in call_logs."""
+    done: Dict[int, Dict] = {}
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                    call_id = int(item["id"])
+                    done[call_id] = {**done.get(call_id, {}), **item}
+                except (ValueError, KeyError):
+                    continue  # خط ناقص از اجرای قطع‌شده
+    return done
+
+
+def _normalize(item: Dict, transcript: str) -> Dict:
+    """Fall back to local keyword analysis when GPT returns an unknown label."""
+    sentiment = str(item.get("sentiment", "")).lower()
+    intent = str(item.get("intent", "")).lower()
+    if sentiment not in SENTIMENTS or intent not in INTENTS:
+        local = analyze_text(transcript)
+        sentiment = sentiment if sentiment in SENTIMENTS else local["sentiment"]
+        intent = intent if intent in INTENTS else local["intent"]
+    return {"id": item["id"], "sentiment": sentiment, "intent": intent, "response": str(item.get("reply", "")).strip()}
+
+
+def _run_packed(calls: List[Dict]) -> Tuple[List[Dict], int]:
+    payload = json.dumps({"calls": [{"id": c["id"], "transcript": c["transcript"]} for c in calls]}, ensure_ascii=False)
+    result = chat_completion(
+        [{"role": "system", "content": _PACKED_SYSTEM_PROMPT}, {"role": "user", "content": payload}],
+        max_tokens=200 * len(calls),
+        response_format={"type": "json_object"},
+    )
+    try:
+        items = json.loads(result["content"])["results"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise GPTError(f"پاسخ JSON نامعتبر از GPT: {e}") from e
+
+    by_id = {c["id"]: c["transcript"] for c in calls}
+    parsed = []
+    for item in items:
+        try:
+            call_id = int(item["id"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if call_id in by_id and item.get("reply"):
+            parsed.append(_normalize({**item, "id": call_id}, by_id[call_id]))
+    return parsed, int(result["usage"].get("total_tokens", 0))
+
+
+def _run_single(call: Dict) -> Tuple[List[Dict], int]:
+    analysis = analyze_text(call["transcript"])
+    prompt = f"احساسات: {analysis['sentiment']}, نیت: {analysis['intent']}, متن: {call['transcript']}"
+    result = chat_completion([{"role": "user", "content": prompt}])
+    item = {"id": call["id"], "sentiment": analysis["sentiment"], "intent": analysis["intent"], "reply": result["content"]}
+    return [_normalize(item, call["transcript"])], int(result["usage"].get("total_tokens", 0))
+
+
+def run_batch(calls: List[Dict],
+              mode: str = "packed",
+              pack_size: int = 8,
+              concurrency: int = 4,
+              rps: float = 2.0,
+              checkpoint_path: Optional[str] = None,
+              write_back: bool = True) -> Dict:
+    """Classify and draft replies for *calls*, resuming from *checkpoint_path* if present."""
+    if mode not in ("packed", "concurrent"):
+        raise ValueError(f"unsupported batch mode: {mode}")
+
+    done = _load_checkpoint(checkpoint_path)
+    pending = [c for c in calls if c["id"] not in done]
+    if mode == "packed":
+        units = [pending[i:i + pack_size] for i in range(0, len(pending), pack_size)]
+        worker = _run_packed
+    else:
+        units = pending
+        worker = _run_single
+
+    stats = {"mode": mode, "selected": len(calls), "resumed": len(calls) - len(pending),
+             "completed": 0, "failed": 0, "requests": 0, "tokens": 0, "aborted": None}
+    limiter = _RateLimiter(rps)
+    write_lock = threading.Lock()
+    checkpoint = open(checkpoint_path, "a", encoding="utf-8") if checkpoint_path else None
+
+    def _task(unit):
+        limiter.wait()
+        return worker(unit)
+
+    def _unit_size(unit) -> int:
+        return len(unit) if mode == "packed" else 1
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            futures = {pool.submit(_task, unit): unit for unit in units}
+            for future in as_completed(futures):
+                unit = futures[future]
+                try:
+                    results, tokens = future.result()
+                except CancelledError:
+                    continue
+                except CircuitOpenError as e:
+                    # سرویس ناسالم است؛ بقیه را لغو کن تا در اجرای بعدی ادامه یابد
+                    stats["aborted"] = str(e)
+                    for f in futures:
+                        f.cancel()
+                    continue
+                except (GPTError, ValueError) as e:
+                    print(f"⚠️ خطا در دسته GPT: {e}")
+                    stats["failed"] += _unit_size(unit)
+                    continue
+                with write_lock:
+                    stats["requests"] += 1
+                    stats["tokens"] += tokens
+                    for r in results:
+                        done[r["id"]] = r
+                        if checkpoint:
+                            checkpoint.write(json.dumps(r, ensure_ascii=False) + "\n")
+                    if checkpoint:
+                        checkpoint.flush()
+                    stats["completed"] += len(results)
+                    # شناسه‌هایی که مدل در پاسخ دسته‌ای جا انداخت
+                    stats["failed"] += _unit_size(unit) - len(results)
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
+    elapsed = time.perf_counter() - start
+    stats["elapsed_sec"] = elapsed
+    stats["tokens_per_sec"] = stats["tokens"] / elapsed if elapsed > 0 else 0.0
+    stats["calls_per_min"] = stats["completed"] / elapsed * 60 if elapsed > 0 else 0.0
+
+    selected_ids = {c["id"] for c in calls}
+    finished = [done[i] for i in selected_ids if i in done]
+    stats["remaining"] = len(selected_ids) - len(finished)
+    if write_back:
+        # نتایج تمام‌شده هر اجرا نوشته می‌شوند تا یک تماس ناموفق کل دسته را معطل نکند
+        unwritten = [r for r in finished if not r.get("written")]
+        stats["updated"] = update_call_analyses(unwritten) if unwritten else 0
+        if checkpoint_path and stats["remaining"] == 0:
+            if os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+        elif checkpoint_path and unwritten:
+            with open(checkpoint_path, "a", encoding="utf-8") as f:
+                for r in unwritten:
+                    f.write(json.dumps({"id": r["id"], "written": True}) + "\n")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Batch GPT classification and reply drafting for call_logs")
+    parser.add_argument("--mode", choices=["packed", "concurrent"], default="packed")
+    parser.add_argument("--pack-size", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rps", type=float, default=2.0, help="max requests per second (0 = unlimited)")
+    parser.add_argument("--since-id", type=int, default=0)
+    parser.add_argument("--ids", type=int, nargs="*", default=None)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--checkpoint", default="storage/batch_gpt_checkpoint.jsonl")
+    parser.add_argument("--dry-run", action="store_true", help="do not write results to call_logs")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.checkpoint) or ".", exist_ok=True)
+    init_db()  # ستون‌های draft_response/reprocessed_at روی دیتابیس‌های قدیمی
+    selected = select_calls(args.since_id, args.limit, args.ids)
+    print(f"📋 {len(selected)} تماس برای پردازش گروهی انتخاب شد")
+    result = run_batch(selected, args.mode, args.pack_size, args.concurrency, args.rps,
+                       args.checkpoint, write_back=not args.dry_run)
+    print(f"📊 نتیجه: {json.dumps(result, ensure_ascii=False)}")
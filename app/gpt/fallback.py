@@ -0,0 +1,13 @@
+# پاسخ‌های آماده برای زمانی که GPT در دسترس نیست یا مهلت تماس تمام شده است
+CANNED_REPLIES = {
+    "pricing": "برای اطلاع از قیمت و هزینه‌ها، همکاران ما به‌زودی با شما تماس می‌گیرند.",
+    "product_availability": "وضعیت موجودی کالا را بررسی می‌کنیم و نتیجه را به شما اطلاع می‌دهیم.",
+    "delivery_status": "درخواست پیگیری ارسال شما ثبت شد و به‌زودی وضعیت تحویل اعلام می‌شود.",
+    "refund": "درخواست مرجوعی شما ثبت شد و کارشناسان ما برای بازگشت وجه تماس می‌گیرند.",
+    "complaint": "از مشکل پیش‌آمده متأسفیم؛ شکایت شما ثبت و به پشتیبانی ارجاع شد.",
+    "faq": "سوال شما ثبت شد و همکاران ما به‌زودی پاسخ را اعلام می‌کنند.",
+}
+
+
+def fallback_reply(intent: str) -> str:
+    return CANNED_REPLIES.get(intent, CANNED_REPLIES["faq"])
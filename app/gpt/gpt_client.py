@@ -1,36 +1,81 @@
-import os
+from typing import Any, Dict, List, Optional
+
 import requests
-from dotenv import load_dotenv
 
-load_dotenv()  # Load environment variables from .env file
+from app.config.config import get_settings, on_reload
+from app.utils.resilience import CircuitOpenError, DeadlineExceeded, get_breaker
+
+_breaker = get_breaker(
+    "gpt",
+    failure_threshold=get_settings().gpt.breaker_failures,
+    reset_timeout=get_settings().gpt.breaker_reset_sec,
+)
+on_reload(lambda s: _breaker.configure(s.gpt.breaker_failures, s.gpt.breaker_reset_sec))
+
 
-GPT_API_KEY = os.getenv("METIS_API_KEY")
-GPT_URL = "https://api.metisai.ir/openai/v1/chat/completions"
+class GPTError(RuntimeError):
+    """The GPT backend failed or timed out; the caller decides on a fallback reply."""
 
-def ask_gpt(prompt: str) -> str:
-    if not GPT_API_KEY:
+
+def chat_completion(messages: List[Dict[str, str]],
+                    max_tokens: int = 256,
+                    timeout: Optional[float] = None,
+                    response_format: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Send one chat completion request through the GPT circuit breaker.
+    Returns {'content': str, 'usage': dict}; raises GPTError, CircuitOpenError or DeadlineExceeded.
+    """
+    cfg = get_settings().gpt
+    if not cfg.api_key:
         raise ValueError("GPT API key not found. Set METIS_API_KEY in your environment.")
 
+    timeout = cfg.timeout_sec if timeout is None else timeout
+    cut_by_deadline = timeout < cfg.timeout_sec
+    if timeout <= 0:
+        _breaker.record_shed()
+        raise DeadlineExceeded("مهلت تماس پیش از GPT تمام شد")
+
+    if not _breaker.allow():
+        raise CircuitOpenError("GPT circuit is open")
+
     headers = {
-        "Authorization": f"Bearer {GPT_API_KEY}",
+        "Authorization": f"Bearer {cfg.api_key}",
         "Content-Type": "application/json"
     }
 
     payload = {
-        "model": "gpt-4.1-mini",
-        "messages": [
-            {"role": "user", "content": prompt}
-        ],
+        "model": cfg.model,
+        "messages": messages,
         "temperature": 0.2,
-        "max_tokens": 256
+        "max_tokens": max_tokens
     }
+    if response_format:
+        payload["response_format"] = response_format
 
+    # هر خطایی پس از allow() باید ثبت شود، وگرنه پروب نیمه‌باز آزاد نمی‌شود
     try:
-        response = requests.post(GPT_URL, headers=headers, json=payload, timeout=30)
+        response = requests.post(cfg.url, headers=headers, json=payload, timeout=timeout)
         response.raise_for_status()
         data = response.json()
-        return data['choices'][0]['message']['content'].strip()
-    except requests.Timeout:
-        return "خطا: پاسخ از سرویس GPT زمان‌بر شد. لطفاً دوباره تلاش کنید."
-    except requests.RequestException as e:
-        return f"خطا در ارتباط با سرویس GPT: {e}"
+        content = data['choices'][0]['message']['content'].strip()
+        usage = data.get("usage") or {}
+    except requests.Timeout as e:
+        if cut_by_deadline:
+            # مهلت تماس کوتاه‌تر از تایم‌اوت سرویس بود؛ نشانه خرابی GPT نیست
+            _breaker.record_deadline_timeout()
+            raise DeadlineExceeded("مهلت تماس در حین انتظار برای GPT تمام شد") from e
+        _breaker.record_failure()
+        raise GPTError("پاسخ از سرویس GPT زمان‌بر شد") from e
+    except (requests.RequestException, ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+        _breaker.record_failure()
+        raise GPTError(f"خطا در ارتباط با سرویس GPT: {e}") from e
+    except Exception:
+        _breaker.record_failure()
+        raise
+
+    _breaker.record_success()
+    return {"content": content, "usage": usage}
+
+
+def ask_gpt(prompt: str, timeout: Optional[float] = None) -> str:
+    return chat_completion([{"role": "user", "content": prompt}], timeout=timeout)["content"]
@@ -1,12 +1,16 @@
 import time
 import uuid
 import os
-from app.gpt.gpt_client import ask_gpt
+from app.config.config import get_settings
+from app.gpt.gpt_client import ask_gpt, GPTError
+from app.gpt.fallback import fallback_reply
 from app.analysis.analysis import analyze_text
 from app.stt.transcriber import transcribe_audio
 from app.database.db import insert_call
 from app.audio.enhancement import enhance_audio_file
+from app.audio.diarization import customer_channel, isolate_customer
 from app.tts.tts_gemini import synthesize_tts
+from app.utils.resilience import CircuitOpenError, Deadline, DeadlineExceeded, get_breaker
 
 
 def _evaluate_gpt_quality(transcript: str, gpt_response: str, intent: str, sentiment: str) -> int:
@@ -31,35 +35,85 @@ def _evaluate_gpt_quality(transcript: str, gpt_response: str, intent: str, senti
 
 
 # پردازش تماس‌ها پس از دریافت فایل صوتی
-def handle_processed_call(audio_file_path):
+def handle_processed_call(audio_file_path, deadline_sec=None, two_party=False):
 	"""
 	پردازش فایل صوتی و ذخیره در دیتابیس
+	deadline_sec: بودجه زمانی کل تماس که بین STT، GPT و TTS تقسیم می‌شود
+	two_party: ضبط دوطرفه (اپراتور + مشتری)؛ فقط صدای مشتری به STT و تحلیل می‌رود
 	"""
 	start_time = time.time()
+	# یک snapshot از تنظیمات برای کل تماس؛ بارگذاری مجدد وسط تماس اثری ندارد
+	settings = get_settings()
+	budget = settings.call_deadline_sec if deadline_sec is None else deadline_sec
+	deadline = Deadline(budget if budget > 0 else None)
+	# زمان هر مرحله (ثانیه) برای پایش و بنچمارک
+	stage_timings = {}
+	# مراحلی که به‌جای اجرای واقعی به حالت جایگزین رفتند (فایل اصلی، پاسخ آماده، بدون صدا)
+	degraded = []
 	
 	enhanced_tmp_path = None
+	customer_tmp_path = None
 	try:
 		print(f"🎵 شروع پردازش فایل صوتی: {audio_file_path}")
 		
 		# مقاوم سازی/بهبود کیفیت صدا
+		diarize = two_party and settings.diarization.enabled
+		channel = customer_channel(audio_file_path) if diarize else None
+		stage_start = time.perf_counter()
 		try:
-			enhanced_tmp_path, stats = enhance_audio_file(audio_file_path)
+			enhanced_tmp_path, stats = enhance_audio_file(audio_file_path, channel=channel)
 			print(f"🛠️ بهبود صدا انجام شد: {stats}")
 		except Exception as e:
 			print(f"⚠️ خطا در بهبود صدا: {e}. ادامه با فایل اصلی")
 			enhanced_tmp_path = None
+			degraded.append('enhance')
+		stage_timings['enhance'] = time.perf_counter() - stage_start
 		
-		# تشخیص گفتار
 		input_path = enhanced_tmp_path or audio_file_path
-		transcript = transcribe_audio(input_path)
+		
+		# جداسازی گوینده: فایل استریو همان‌جا با انتخاب کانال جدا شده، فایل مونو خوشه‌بندی می‌شود
+		if diarize and channel is None:
+			stage_start = time.perf_counter()
+			try:
+				customer_tmp_path, diar_stats = isolate_customer(input_path)
+				print(f"🗣️ جداسازی گوینده: {diar_stats}")
+			except Exception as e:
+				print(f"⚠️ خطا در جداسازی گوینده: {e}. ادامه با کل صدا")
+				customer_tmp_path = None
+				degraded.append('diarization')
+			stage_timings['diarization'] = time.perf_counter() - stage_start
+			input_path = customer_tmp_path or input_path
+		
+		# تشخیص گفتار
+		stage_start = time.perf_counter()
+		transcript = transcribe_audio(input_path, deadline=deadline)
+		stage_timings['stt'] = time.perf_counter() - stage_start
 		print(f"✅ متن تشخیص داده شده: {transcript}")
 		
 		# تحلیل متن
+		stage_start = time.perf_counter()
 		analysis_result = analyze_text(transcript)
+		stage_timings['analysis'] = time.perf_counter() - stage_start
 		print(f"🔍 نتیجه تحلیل: {analysis_result}")
 		
 		# دریافت پاسخ از GPT
-		gpt_response = ask_gpt(f"احساسات: {analysis_result['sentiment']}, نیت: {analysis_result['intent']}, متن: {transcript}")
+		stage_start = time.perf_counter()
+		gpt_fallback = False
+		try:
+			if deadline.expired():
+				get_breaker("gpt").record_shed()
+				raise DeadlineExceeded("مهلت تماس پیش از GPT تمام شد")
+			gpt_response = ask_gpt(
+				f"احساسات: {analysis_result['sentiment']}, نیت: {analysis_result['intent']}, متن: {transcript}",
+				timeout=deadline.timeout(settings.gpt.timeout_sec)
+			)
+		except (GPTError, CircuitOpenError, DeadlineExceeded) as e:
+			# پاسخ آماده به‌جای ذخیره/خواندن پیام خطا برای مشتری
+			print(f"⚠️ GPT در دسترس نیست ({e})، استفاده از پاسخ آماده")
+			gpt_response = fallback_reply(analysis_result['intent'])
+			gpt_fallback = True
+			degraded.append('gpt')
+		stage_timings['gpt'] = time.perf_counter() - stage_start
 		print(f"🤖 پاسخ GPT: {gpt_response}")
 		
 		# تولید شناسه یکتا
@@ -67,13 +121,24 @@ def handle_processed_call(audio_file_path):
 		
 		# تولید صدای ماشینی (اختیاری)
 		audio_response_path = None
-		if os.getenv("ENABLE_TTS", "0") == "1":
+		if settings.tts.enabled and deadline.expired():
+			get_breaker("tts").record_shed()
+			print("⏳ مهلت تماس تمام شده، TTS انجام نشد")
+			degraded.append('tts')
+		elif settings.tts.enabled:
+			stage_start = time.perf_counter()
 			try:
-				meta = synthesize_tts(gpt_response)
+				meta = synthesize_tts(gpt_response, timeout_sec=deadline.timeout(settings.tts.timeout_sec))
 				audio_response_path = meta.get("audio_file")
-				print(f"🔊 فایل صوتی تولید شد: {audio_response_path}")
+				if audio_response_path:
+					print(f"🔊 فایل صوتی تولید شد: {audio_response_path}")
+				else:
+					print(f"⚠️ خطا در تولید صدای ماشینی: {meta.get('error')}")
+					degraded.append('tts')
 			except Exception as e:
 				print(f"⚠️ خطا در تولید صدای ماشینی: {e}")
+				degraded.append('tts')
+			stage_timings['tts'] = time.perf_counter() - stage_start
 		else:
 			print("🎵 TTS غیرفعال است")
 		
@@ -82,10 +147,12 @@ def handle_processed_call(audio_file_path):
 		print(f"⏱️ زمان پردازش کل: {processing_time:.2f} ثانیه")
 		
 		# KPI کیفیت پاسخ GPT
-		gpt_quality = _evaluate_gpt_quality(transcript, gpt_response, analysis_result['intent'], analysis_result['sentiment'])
+		gpt_quality = 0 if gpt_fallback else _evaluate_gpt_quality(transcript, gpt_response, analysis_result['intent'], analysis_result['sentiment'])
 
 		# ذخیره در دیتابیس
+		stage_start = time.perf_counter()
 		insert_call(unique_id, analysis_result['sentiment'], analysis_result['intent'], gpt_response, transcript, processing_time, audio_response_path, gpt_quality)
+		stage_timings['db'] = time.perf_counter() - stage_start
 		print(f"💾 تماس در دیتابیس ذخیره شد: {unique_id}")
 		
 		return {
@@ -95,9 +162,12 @@ def handle_processed_call(audio_file_path):
 			'sentiment': analysis_result['sentiment'],
 			'intent': analysis_result['intent'],
 			'gpt_response': gpt_response,
+			'gpt_fallback': gpt_fallback,
 			'audio_response_path': audio_response_path,
 			'processing_time': processing_time,
-			'gpt_quality': gpt_quality
+			'gpt_quality': gpt_quality,
+			'stage_timings': stage_timings,
+			'degraded': degraded
 		}
 		
 	except Exception as e:
@@ -106,15 +176,18 @@ def handle_processed_call(audio_file_path):
 		return {
 			'success': False,
 			'error': str(e),
-			'processing_time': processing_time
+			'processing_time': processing_time,
+			'stage_timings': stage_timings,
+			'degraded': degraded
 		}
 	finally:
-		# پاکسازی فایل موقت بهبود یافته
-		try:
-			if enhanced_tmp_path and os.path.exists(enhanced_tmp_path):
-				os.remove(enhanced_tmp_path)
-		except Exception:
-			pass
+		# پاکسازی فایل‌های موقت بهبود یافته و صدای مشتری
+		for tmp_path in (enhanced_tmp_path, customer_tmp_path):
+			try:
+				if tmp_path and os.path.exists(tmp_path):
+					os.remove(tmp_path)
+			except Exception:
+				pass
 
 # مثال برای پردازش تماس
 if __name__ == "__main__":
@@ -0,0 +1,241 @@
+import os
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import soundfile as sf
+
+from app.config.config import get_settings
+from app.database.db import update_audio_response_path, clear_audio_response_path
+
+try:
+    import fcntl  # type: ignore
+    _fcntl_available = True
+except Exception:
+    _fcntl_available = False
+
+# نرخ‌های نمونه‌برداری مجاز برای Opus؛ سایر نرخ‌ها به FLAC می‌روند
+_OPUS_RATES = {8000, 12000, 16000, 24000, 48000}
+
+_MIME_TYPES = {
+    ".wav": "audio/wav",
+    ".opus": "audio/ogg",
+    ".ogg": "audio/ogg",
+    ".flac": "audio/flac",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+}
+
+_worker_thread: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+
+def _storage_dirs() -> List[str]:
+    cfg = get_settings().storage
+    return [cfg.upload_folder, cfg.responses_dir]
+
+
+def _is_responses_dir(directory: str) -> bool:
+    return os.path.abspath(directory) == os.path.abspath(get_settings().storage.responses_dir)
+
+
+def guess_audio_mimetype(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    return _MIME_TYPES.get(ext, "application/octet-stream")
+
+
+def resolve_audio_path(path: Optional[str]) -> Optional[str]:
+    """Return an existing file for *path*, following a WAV to its compressed sibling.
+
+    Covers the short window between transcoding and the call_logs update.
+    """
+    if not path:
+        return None
+    if os.path.exists(path):
+        return path
+    base, ext = os.path.splitext(path)
+    if ext.lower() == ".wav":
+        for candidate_ext in (".opus", ".flac"):
+            candidate = base + candidate_ext
+            if os.path.exists(candidate):
+                return candidate
+    return None
+
+
+def compress_audio_file(path: str, codec: Optional[str] = None) -> str:
+    """
+    Transcode a WAV file to Opus (default) or FLAC next to the original.
+    The output is written to a temp name and renamed into place, so readers never
+    see a half-written file. The original WAV is left untouched and its timestamps
+    are copied to the output, so retention still ages the audio from when it was recorded.
+    Returns the path of the compressed file.
+    """
+    codec = (codec or get_settings().storage.codec).lower()
+    st = os.stat(path)
+    info = sf.info(path)
+    if codec == "opus" and info.samplerate not in _OPUS_RATES:
+        codec = "flac"
+
+    base = os.path.splitext(path)[0]
+    if codec == "opus":
+        out_path = base + ".opus"
+        fmt, subtype = "OGG", "OPUS"
+    else:
+        out_path = base + ".flac"
+        fmt, subtype = "FLAC", "PCM_16"
+
+    audio, sr = sf.read(path, dtype="float32")
+    tmp_path = out_path + ".part"
+    try:
+        sf.write(tmp_path, audio, sr, format=fmt, subtype=subtype)
+        os.utime(tmp_path, (st.st_atime, st.st_mtime))
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return out_path
+
+
+def _list_audio_files(directory: str) -> List[Tuple[str, float, int]]:
+    files = []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if not entry.is_file() or entry.name.endswith(".part"):
+                    continue
+                st = entry.stat()
+                files.append((entry.path, st.st_mtime, st.st_size))
+    except FileNotFoundError:
+        pass
+    return files
+
+
+def _remove_file(path: str, is_response: bool) -> bool:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"⚠️ خطا در حذف فایل {path}: {e}")
+        return False
+    if is_response:
+        clear_audio_response_path(path)
+    return True
+
+
+def compress_cold_files(directory: str, hot_hours: float, batch_size: int) -> int:
+    """Transcode up to *batch_size* WAV files older than *hot_hours* in *directory*."""
+    is_response = _is_responses_dir(directory)
+    cutoff = time.time() - hot_hours * 3600
+    cold = [f for f in _list_audio_files(directory)
+            if f[0].lower().endswith(".wav") and f[1] < cutoff]
+    cold.sort(key=lambda f: f[1])
+
+    done = 0
+    for path, _, _ in cold[:batch_size]:
+        try:
+            new_path = compress_audio_file(path)
+        except Exception as e:
+            print(f"⚠️ خطا در فشرده‌سازی {path}: {e}")
+            continue
+        # مسیر در دیتابیس باید پیش از حذف فایل اصلی به‌روز شود
+        if is_response and not update_audio_response_path(path, new_path):
+            try:
+                os.remove(new_path)
+            except Exception:
+                pass
+            continue
+        try:
+            os.remove(path)
+        except Exception as e:
+            print(f"⚠️ خطا در حذف فایل اصلی {path}: {e}")
+        done += 1
+    return done
+
+
+def apply_retention(directory: str, max_age_days: float, max_bytes: int) -> int:
+    """Delete files older than *max_age_days*, then the oldest ones until under *max_bytes*."""
+    is_response = _is_responses_dir(directory)
+    files = sorted(_list_audio_files(directory), key=lambda f: f[1])
+    removed = 0
+
+    if max_age_days > 0:
+        cutoff = time.time() - max_age_days * 86400
+        kept = []
+        for path, mtime, size in files:
+            if mtime < cutoff and _remove_file(path, is_response):
+                removed += 1
+            else:
+                kept.append((path, mtime, size))
+        files = kept
+
+    if max_bytes > 0:
+        total = sum(f[2] for f in files)
+        for path, _, size in files:
+            if total <= max_bytes:
+                break
+            if _remove_file(path, is_response):
+                total -= size
+                removed += 1
+    return removed
+
+
+def _acquire_maintenance_lock():
+    """Allow one maintenance pass at a time across gunicorn workers."""
+    if not _fcntl_available:
+        return None, True
+    lock_path = get_settings().storage.lock_file
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    fh = open(lock_path, "w")
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return fh, True
+    except OSError:
+        fh.close()
+        return None, False
+
+
+def run_storage_maintenance() -> Dict[str, int]:
+    """Run one batch of transcoding and retention over the recordings and responses dirs."""
+    cfg = get_settings().storage
+    max_bytes = int(cfg.max_mb * 1024 * 1024)
+
+    stats = {"compressed": 0, "removed": 0}
+    fh, acquired = _acquire_maintenance_lock()
+    if not acquired:
+        return stats
+    try:
+        for directory in _storage_dirs():
+            # ابتدا حذف فایل‌های منقضی، تا فایلی که باید حذف شود بی‌جهت فشرده نشود
+            stats["removed"] += apply_retention(directory, cfg.retention_days, max_bytes)
+            stats["compressed"] += compress_cold_files(directory, cfg.hot_hours, cfg.batch_size)
+    finally:
+        if fh is not None:
+            fh.close()
+    return stats
+
+
+def _worker_loop() -> None:
+    while True:
+        try:
+            stats = run_storage_maintenance()
+            if stats["compressed"] or stats["removed"]:
+                print(f"🗄️ نگهداری فایل‌های صوتی: {stats}")
+        except Exception as e:
+            print(f"⚠️ خطا در نگهداری فایل‌های صوتی: {e}")
+        # فاصله در هر دور از تنظیمات خوانده می‌شود تا بارگذاری مجدد اثر کند
+        time.sleep(get_settings().storage.interval_sec)
+
+
+def start_storage_worker() -> None:
+    """Start the background maintenance thread once per process."""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return
+        _worker_thread = threading.Thread(target=_worker_loop, daemon=True)
+        _worker_thread.start()
+
+
+if __name__ == "__main__":
+    print(f"🗄️ نتیجه نگهداری فایل‌های صوتی: {run_storage_maintenance()}")
@@ -1,38 +1,43 @@
-import whisper
 import os
 import tempfile
 from typing import Optional
 
-import librosa
 import soundfile as sf
-try:
-    import torch  # type: ignore
-    _torch_available = True
-except Exception:
-    _torch_available = False
 
-def transcribe_audio(file_path):
+from app.config.config import get_settings
+from app.utils.lazy_import import lazy_module, module_available
+from app.utils.resilience import Deadline
+
+# whisper/torch/librosa در اولین استفاده بارگذاری می‌شوند
+whisper = lazy_module("whisper")
+librosa = lazy_module("librosa")
+torch = lazy_module("torch")
+
+def transcribe_audio(file_path, deadline: Optional[Deadline] = None):
     """
     تشخیص گفتار با تنظیمات بهینه برای زبان فارسی
+    اگر مهلت تماس (deadline) تمام شده باشد، تلاش دوباره با مدل large انجام نمی‌شود.
     """
+    # یک snapshot از تنظیمات برای کل این فراخوانی
+    cfg = get_settings().whisper
     try:
         print(f"🎵 شروع تشخیص گفتار از فایل: {os.path.basename(file_path)}")
         
-        # انتخاب مدل از متغیر محیطی، پیش‌فرض دقیق‌تر برای کیفیت بهتر
-        model_name = os.getenv("WHISPER_MODEL", "medium")
+        # انتخاب مدل از تنظیمات، پیش‌فرض دقیق‌تر برای کیفیت بهتر
+        model_name = cfg.model
         print(f"🔄 بارگذاری مدل Whisper {model_name}...")
         
         try:
             model = whisper.load_model(model_name)
         except Exception as e:
             print(f"⚠️ خطا در بارگذاری مدل {model_name}: {e}")
-            fallback_model = os.getenv("WHISPER_FALLBACK_MODEL", "medium")
+            fallback_model = cfg.fallback_model
             print(f"🔄 تلاش با مدل {fallback_model}...")
             model = whisper.load_model(fallback_model)
             model_name = fallback_model
 
         # پیش‌پردازش صوت: مونو و 16kHz برای پایداری بیشتر
-        preprocess_enabled = os.getenv("WHISPER_PREPROCESS", "1") == "1"
+        preprocess_enabled = cfg.preprocess
         input_path = file_path
         tmp_path: Optional[str] = None
         if preprocess_enabled:
@@ -47,23 +52,22 @@ def transcribe_audio(file_path):
                 print(f"⚠️ خطا در پیش‌پردازش صوت: {e}. ادامه با فایل اصلی")
 
         # تنظیمات بهینه و قابل‌پیکربندی
-        use_fp16 = _torch_available and torch.cuda.is_available()
-        beam_size = int(os.getenv("WHISPER_BEAM_SIZE", "5"))
-        best_of = int(os.getenv("WHISPER_BEST_OF", "5"))
-        condition_prev = os.getenv("WHISPER_CONDITION_ON_PREVIOUS", "1") == "1"
+        use_fp16 = module_available("torch") and torch.cuda.is_available()
+        beam_size = cfg.beam_size
+        best_of = cfg.best_of
 
         result = model.transcribe(
             input_path,
-            language=os.getenv("WHISPER_LANGUAGE", "fa"),
+            language=cfg.language,
             task="transcribe",
             fp16=use_fp16,
             verbose=True,
             temperature=0.0,
-            compression_ratio_threshold=float(os.getenv("WHISPER_COMPRESSION_RATIO", "2.4")),
-            logprob_threshold=float(os.getenv("WHISPER_LOGPROB_THRESHOLD", "-1.0")),
-            no_speech_threshold=float(os.getenv("WHISPER_NO_SPEECH_THRESHOLD", "0.6")),
-            condition_on_previous_text=condition_prev,
-            initial_prompt=os.getenv("WHISPER_INITIAL_PROMPT", "این یک مکالمه فارسی است"),
+            compression_ratio_threshold=cfg.compression_ratio,
+            logprob_threshold=cfg.logprob_threshold,
+            no_speech_threshold=cfg.no_speech_threshold,
+            condition_on_previous_text=cfg.condition_on_previous,
+            initial_prompt=cfg.initial_prompt,
             beam_size=beam_size,
             best_of=best_of
         )
@@ -75,14 +79,14 @@ def transcribe_audio(file_path):
         print(f"📊 اطمینان: {confidence:.2f}")
         
         # اگر اطمینان کم است و مدل base/medium نیست، با مدل large تلاش کن (اختیاری)
-        try_large = os.getenv("WHISPER_TRY_LARGE_ON_LOW_CONF", "1") == "1"
-        if try_large and confidence < -1.0 and model_name != "large":
+        try_large = cfg.try_large_on_low_conf
+        if try_large and confidence < -1.0 and model_name != "large" and not (deadline and deadline.expired()):
             print("⚠️ اطمینان کم، تلاش با مدل large...")
             try:
                 large_model = whisper.load_model("large")
                 large_result = large_model.transcribe(
                     input_path,
-                    language=os.getenv("WHISPER_LANGUAGE", "fa"),
+                    language=cfg.language,
                     temperature=0.0,
                     verbose=False,
                     beam_size=beam_size,
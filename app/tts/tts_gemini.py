@@ -1,16 +1,23 @@
 
 import os
+import time
 import uuid
 import wave
 from typing import Optional, Dict, Any
 
-try:
-    from google import genai
-    from google.genai import types
-    _gemini_ok = True
-except Exception as _e:
-    _gemini_ok = False
-    _gemini_import_error = str(_e)
+from app.config.config import get_settings, on_reload
+from app.utils.lazy_import import lazy_module, module_available, import_error
+from app.utils.resilience import get_breaker
+
+genai = lazy_module("google.genai")
+types = lazy_module("google.genai.types")
+
+_breaker = get_breaker(
+    "tts",
+    failure_threshold=get_settings().tts.breaker_failures,
+    reset_timeout=get_settings().tts.breaker_reset_sec,
+)
+on_reload(lambda s: _breaker.configure(s.tts.breaker_failures, s.tts.breaker_reset_sec))
 
 
 def _save_wav(pcm_bytes: bytes, path: str, rate: int = 24000, channels: int = 1, sampwidth: int = 2) -> None:
@@ -27,34 +34,55 @@ def synthesize_tts(text: str,
                    voice: Optional[str] = None,
                    gender: Optional[str] = None,
                    server: Optional[str] = None,
-                   timeout_sec: int = 60) -> Dict[str, Any]:
+                   timeout_sec: Optional[float] = None) -> Dict[str, Any]:
     """Gemini TTS in the *old* talkbot_tts format.
 
     Parameters mirror the previous API so the rest of the app doesn't need changes.
     Returns a dict that (on success) includes 'audio_file' pointing to a saved WAV file.
+    timeout_sec defaults to TTS_TIMEOUT_SEC.
+    While the TTS circuit is open the call is shed immediately with meta['shed'] = True.
     """
     if not text or not isinstance(text, str):
         raise ValueError("text must be a non-empty string")
 
+    cfg = get_settings()
+    if timeout_sec is None:
+        timeout_sec = cfg.tts.timeout_sec
     meta: Dict[str, Any] = {
         "engine": "gemini",
-        "model": os.getenv("GEMINI_TTS_MODEL", "gemini-2.5-flash-preview-tts"),
-        "voice": voice or os.getenv("GEMINI_TTS_VOICE", "achernar"),
-        "lang": (lang or os.getenv("TTS_LANG") or "auto"),
+        "model": cfg.tts.model,
+        "voice": voice or cfg.tts.voice,
+        "lang": (lang or cfg.tts.lang or "auto"),
         "status_code": 0,
     }
 
-    api_key = os.environ.get("GEMINI_API_KEY")
+    api_key = cfg.tts.api_key
     if not api_key:
         meta["error"] = "GEMINI_API_KEY env var is required"
         return meta
 
-    if not _gemini_ok:
-        meta["error"] = f"google-genai import failed: {_gemini_import_error}"
+    if not module_available("google.genai"):
+        meta["error"] = f"google-genai import failed: {import_error('google.genai')}"
+        return meta
+
+    # کمتر از یک میلی‌ثانیه باقی مانده؛ تایم‌اوت صفر مهلت را رعایت نمی‌کند
+    timeout_ms = int(timeout_sec * 1000)
+    if timeout_ms <= 0:
+        _breaker.record_shed()
+        meta["error"] = "call deadline exceeded before TTS"
+        meta["shed"] = True
+        return meta
+
+    if not _breaker.allow():
+        meta["error"] = "TTS circuit is open"
+        meta["shed"] = True
         return meta
 
+    started = time.monotonic()
     try:
-        client = genai.Client(api_key=api_key)
+        # GEMINI_BASE_URL برای هدایت به سرور محلی (مثلاً در بنچمارک)
+        http_options = types.HttpOptions(base_url=cfg.tts.base_url, timeout=timeout_ms)
+        client = genai.Client(api_key=api_key, http_options=http_options)
         resp = client.models.generate_content(
             model=meta["model"],
             contents=text,
@@ -68,19 +96,19 @@ def synthesize_tts(text: str,
                     )
                 )
             ),
-            # NOTE: timeout is handled by underlying client; we keep timeout_sec for signature compatibility
         )
 
         # Extract the first audio part
         part = resp.candidates[0].content.parts[0]
         if not hasattr(part, "inline_data") or not getattr(part.inline_data, "data", None):
             meta["error"] = "No audio data returned from Gemini"
+            _breaker.record_failure()
             return meta
 
         pcm_bytes = part.inline_data.data  # bytes (PCM)
 
         # Where to save (same convention as old script)
-        responses_dir = os.getenv("RESPONSES_DIR", "storage/responses")
+        responses_dir = cfg.storage.responses_dir
         os.makedirs(responses_dir, exist_ok=True)
         file_name = f"response_{uuid.uuid4()}.wav"
         out_path = os.path.join(responses_dir, file_name)
@@ -94,8 +122,15 @@ def synthesize_tts(text: str,
             "audio_mime": "audio/wav",
             "bytes": len(pcm_bytes)
         })
+        _breaker.record_success()
         return meta
 
     except Exception as e:
+        # اگر تایم‌اوت به‌خاطر مهلت تماس کوتاه شده و تمام شده باشد، خطای Gemini حساب نمی‌شود
+        if timeout_sec < cfg.tts.timeout_sec and time.monotonic() - started >= timeout_sec:
+            _breaker.record_deadline_timeout()
+            meta["shed"] = True
+        else:
+            _breaker.record_failure()
         meta["error"] = str(e)
         return meta
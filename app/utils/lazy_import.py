@@ -0,0 +1,51 @@
+import importlib
+import threading
+from typing import Dict, Optional
+
+# بارگذاری تنبل ماژول‌های سنگین (whisper, torch, librosa, transformers, ...)
+# تا شروع به کار workerها و ابزارهای CLI منتظر آن‌ها نماند.
+
+_lock = threading.Lock()
+_import_errors: Dict[str, str] = {}
+
+
+class LazyModule:
+    """Proxy that imports the wrapped module on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with _lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def module_available(name: str) -> bool:
+    """Import *name* on demand and report whether it succeeded (result is cached)."""
+    if name in _import_errors:
+        return False
+    try:
+        importlib.import_module(name)
+        return True
+    except Exception as e:
+        _import_errors[name] = str(e)
+        return False
+
+
+def import_error(name: str) -> Optional[str]:
+    return _import_errors.get(name)
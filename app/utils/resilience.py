@@ -0,0 +1,143 @@
+import threading
+import time
+from typing import Dict, Optional
+
+
+class CircuitOpenError(RuntimeError):
+    """The backend is marked unhealthy; the call was shed without being attempted."""
+
+
+class DeadlineExceeded(RuntimeError):
+    """The per-call time budget ran out before the stage could start."""
+
+
+class Deadline:
+    """Time budget for one call, shared by every stage of the pipeline."""
+
+    def __init__(self, budget_sec: Optional[float]):
+        self.budget_sec = budget_sec
+        self._expires_at = None if budget_sec is None else time.monotonic() + budget_sec
+
+    def remaining(self) -> Optional[float]:
+        if self._expires_at is None:
+            return None
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0.0
+
+    def timeout(self, cap: float) -> float:
+        """Timeout for a single external call: *cap*, clipped to what is left of the budget."""
+        remaining = self.remaining()
+        return cap if remaining is None else min(cap, remaining)
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker.
+    After *failure_threshold* consecutive failures calls are shed for
+    *reset_timeout* seconds, then a single probe decides whether to close again.
+    A probe that never reports back is given up after another *reset_timeout*.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        self._counters = {"calls": 0, "successes": 0, "failures": 0, "shed": 0, "opened": 0}
+
+    def configure(self, failure_threshold: int, reset_timeout: float) -> None:
+        """Apply new thresholds (e.g. after a settings reload) without resetting state."""
+        with self._lock:
+            self.failure_threshold = failure_threshold
+            self.reset_timeout = reset_timeout
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if (self._state == self.HALF_OPEN and self._probe_in_flight
+                    and now - self._probe_started_at >= self.reset_timeout):
+                # پروب قبلی هرگز نتیجه‌ای گزارش نکرد؛ پروب تازه مجاز است
+                self._probe_in_flight = False
+            if self._state == self.CLOSED or (self._state == self.HALF_OPEN and not self._probe_in_flight):
+                if self._state == self.HALF_OPEN:
+                    self._probe_in_flight = True
+                    self._probe_started_at = now
+                self._counters["calls"] += 1
+                return True
+            self._counters["shed"] += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._counters["successes"] += 1
+            self._consecutive_failures = 0
+            self._state = self.CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._counters["failures"] += 1
+            self._consecutive_failures += 1
+            if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._counters["opened"] += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def record_shed(self) -> None:
+        """Count a call dropped before reaching the breaker (e.g. deadline already spent)."""
+        with self._lock:
+            self._counters["shed"] += 1
+
+    def record_deadline_timeout(self) -> None:
+        """
+        An allowed call timed out only because its timeout was cut to the remaining call budget.
+        That says nothing about backend health: count it as shed and free a half-open probe.
+        """
+        with self._lock:
+            self._counters["shed"] += 1
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                **self._counters,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> CircuitBreaker:
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, failure_threshold, reset_timeout)
+        return breaker
+
+
+def breaker_stats() -> Dict[str, Dict]:
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.stats() for b in breakers}
@@ -0,0 +1,94 @@
+"""
+Deterministic fixture corpus of synthetic Persian-like speech.
+
+Each clip is a sequence of CV syllables built from the six Persian vowels
+(formant-shaped harmonic series over a jittered pitch contour) with noise
+bursts for consonants, word pauses and a low background noise floor.
+The same seed always produces the same files.
+"""
+import json
+import os
+from typing import Dict, List, Sequence
+
+import numpy as np
+import soundfile as sf
+
+SAMPLE_RATE = 16000
+DEFAULT_DURATIONS = (3.0, 8.0, 15.0, 30.0, 60.0)
+
+# فرمنت‌های تقریبی واکه‌های فارسی (F1, F2, F3)
+_VOWEL_FORMANTS = {
+    "a": (730, 1090, 2440),
+    "â": (570, 840, 2410),
+    "e": (530, 1840, 2480),
+    "i": (270, 2290, 3010),
+    "o": (450, 800, 2830),
+    "u": (300, 870, 2240),
+}
+_FORMANT_BW = np.array([90.0, 120.0, 160.0])
+
+# متن‌های مرجع برای حالت STT جایگزین (هر کدام یک نیت متفاوت)
+TRANSCRIPTS = [
+    "سلام قیمت این محصول چقدر است",
+    "آیا این کالا موجود است یا نه",
+    "سفارش من کی ارسال می‌شود و زمان تحویل چقدر است",
+    "می‌خواهم کالا را مرجوعی بدهم و بازگشت وجه داشته باشم",
+    "از کیفیت محصول ناراضی هستم و شکایت دارم",
+    "ساعت کاری پشتیبانی چه زمانی است",
+]
+
+
+def _syllable(rng: np.random.Generator, f0: float) -> np.ndarray:
+    n = int(rng.uniform(0.12, 0.28) * SAMPLE_RATE)
+    t = np.arange(n) / SAMPLE_RATE
+    formants = np.array(_VOWEL_FORMANTS[str(rng.choice(list(_VOWEL_FORMANTS)))], dtype=float)
+
+    f0_curve = f0 * (1.0 + 0.04 * np.sin(2 * np.pi * rng.uniform(2.0, 5.0) * t)) \
+        * (1.0 + 0.01 * rng.standard_normal(n).cumsum() / np.sqrt(n))
+    phase = 2 * np.pi * np.cumsum(f0_curve) / SAMPLE_RATE
+    harmonics = np.arange(1, int(3800 / f0) + 1)
+    freqs = harmonics * f0
+    amps = np.exp(-0.5 * ((freqs[:, None] - formants[None, :]) / _FORMANT_BW[None, :]) ** 2).sum(axis=1) + 0.02
+    voiced = (amps[:, None] * np.sin(np.outer(harmonics, phase))).sum(axis=0)
+    voiced *= np.hanning(n)
+
+    burst_n = int(rng.uniform(0.02, 0.07) * SAMPLE_RATE)
+    burst = rng.standard_normal(burst_n) * np.linspace(0.4, 0.0, burst_n)
+    burst = np.convolve(burst, np.ones(3) / 3.0, mode="same")
+
+    out = np.concatenate([burst, voiced])
+    return out / (np.max(np.abs(out)) + 1e-9)
+
+
+def synthesize_clip(duration_sec: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    target_n = int(duration_sec * SAMPLE_RATE)
+    f0 = rng.uniform(110.0, 220.0)
+    chunks: List[np.ndarray] = []
+    total = 0
+    while total < target_n:
+        for _ in range(int(rng.integers(2, 5))):
+            chunks.append(_syllable(rng, f0) * rng.uniform(0.5, 0.9))
+        chunks.append(np.zeros(int(rng.uniform(0.08, 0.35) * SAMPLE_RATE)))
+        total = sum(len(c) for c in chunks)
+    audio = np.concatenate(chunks)[:target_n]
+    audio += 0.01 * rng.standard_normal(target_n)
+    return (0.5 * audio / (np.max(np.abs(audio)) + 1e-9)).astype(np.float32)
+
+
+def generate_corpus(out_dir: str, durations: Sequence[float] = DEFAULT_DURATIONS, seed: int = 1234) -> List[Dict]:
+    """Write the corpus to *out_dir* (skipping files that already exist) and return its manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = []
+    for i, duration in enumerate(durations):
+        path = os.path.join(out_dir, f"clip_{i:02d}_{int(duration)}s.wav")
+        if not os.path.exists(path):
+            sf.write(path, synthesize_clip(duration, seed + i), SAMPLE_RATE, subtype="PCM_16")
+        manifest.append({
+            "path": path,
+            "duration_sec": float(duration),
+            "transcript": TRANSCRIPTS[i % len(TRANSCRIPTS)],
+        })
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"seed": seed, "clips": manifest}, f, ensure_ascii=False, indent=2)
+    return manifest
@@ -0,0 +1,239 @@
+"""
+End-to-end benchmark for handle_processed_call.
+
+Runs the synthetic corpus through the full pipeline with GPT and Gemini TTS
+pointed at local stub servers, at one or more concurrency levels, and writes
+per-stage latency percentiles, calls/min and peak RSS as JSON.
+
+Calls where a stage fell back instead of running (enhancement skipped, canned
+GPT reply, no TTS audio) are counted per stage under "degraded"; their
+timings would measure a no-op, so the run is marked invalid and exits
+non-zero unless --allow-degraded is given.
+
+    python -m benchmarks.e2e --concurrency 1 4 --repeat 3 --out bench.json
+    python -m benchmarks.e2e --stt stub --baseline bench.json   # isolate non-Whisper stages
+
+Whisper still runs for real unless --stt stub is given; pin WHISPER_MODEL
+(default here: tiny) so runs are comparable between commits.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.corpus import DEFAULT_DURATIONS, generate_corpus
+from benchmarks.stub_servers import start_stub_server
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+STAGES = ("enhance", "stt", "analysis", "gpt", "tts", "db", "total")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss روی لینوکس بر حسب کیلوبایت و روی macOS بر حسب بایت است
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    arr = np.asarray(values)
+    return {
+        "count": int(arr.size),
+        "mean": float(arr.mean()),
+        "p50": float(np.percentile(arr, 50)),
+        "p95": float(np.percentile(arr, 95)),
+        "p99": float(np.percentile(arr, 99)),
+        "max": float(arr.max()),
+    }
+
+
+def _configure_env(base_url: str, workdir: str) -> None:
+    """Must run before any app module is imported: config is read at import time."""
+    os.environ["METIS_API_URL"] = f"{base_url}/openai/v1/chat/completions"
+    os.environ["METIS_API_KEY"] = "bench"
+    os.environ["GEMINI_BASE_URL"] = base_url
+    os.environ["GEMINI_API_KEY"] = "bench"
+    os.environ["ENABLE_TTS"] = "1"
+    os.environ["DB_FILE"] = os.path.join(workdir, "bench_call_logs.db")
+    os.environ["RESPONSES_DIR"] = os.path.join(workdir, "responses")
+    os.environ.setdefault("WHISPER_MODEL", "tiny")
+    os.environ.setdefault("WHISPER_TRY_LARGE_ON_LOW_CONF", "0")
+    os.environ.setdefault("SENTIMENT_BACKEND", "keyword")
+
+
+def _install_stub_stt(main_module, manifest: List[Dict]) -> None:
+    """Replace Whisper with a lookup by clip duration (the enhanced temp file keeps it)."""
+    import soundfile as sf
+
+    by_duration = sorted((c["duration_sec"], c["transcript"]) for c in manifest)
+
+    def transcribe_stub(path, deadline=None):
+        duration = sf.info(path).duration
+        return min(by_duration, key=lambda c: abs(c[0] - duration))[1]
+
+    main_module.transcribe_audio = transcribe_stub
+
+
+@contextlib.contextmanager
+def _quiet(enabled: bool):
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        yield
+
+
+def _run_level(handle, clips: List[Dict], concurrency: int, quiet: bool) -> Dict:
+    samples: Dict[str, List[float]] = {s: [] for s in STAGES}
+    degraded: Dict[str, int] = {}
+    errors = 0
+    with _quiet(quiet):
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda c: handle(c["path"]), clips))
+        wall = time.perf_counter() - wall_start
+
+    for r in results:
+        for stage in r.get("degraded", []):
+            degraded[stage] = degraded.get(stage, 0) + 1
+        if not r.get("success"):
+            errors += 1
+            continue
+        for stage, sec in r.get("stage_timings", {}).items():
+            samples.setdefault(stage, []).append(sec)
+        samples["total"].append(r["processing_time"])
+
+    return {
+        "concurrency": concurrency,
+        "calls": len(clips),
+        "errors": errors,
+        "wall_sec": wall,
+        "calls_per_min": len(clips) / wall * 60 if wall > 0 else 0.0,
+        "degraded": degraded,
+        "latency_sec": {stage: _percentiles(v) for stage, v in samples.items() if v},
+        # بیشینه RSS کل فرایند تا پایان این سطح، نه مصرف همین سطح به‌تنهایی
+        "process_peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _compare(current: Dict, baseline_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    base_levels = {lvl["concurrency"]: lvl for lvl in baseline.get("levels", [])}
+    print(f"\nمقایسه با {baseline.get('git_commit', '?')[:10]}:")
+    for lvl in current["levels"]:
+        old = base_levels.get(lvl["concurrency"])
+        if not old:
+            continue
+        cur_total, old_total = lvl["latency_sec"].get("total", {}), old["latency_sec"].get("total", {})
+        for key in ("p50", "p95", "p99"):
+            if key in cur_total and old_total.get(key):
+                print(f"  c={lvl['concurrency']:<3} total {key}: {old_total[key]:.3f}s -> {cur_total[key]:.3f}s "
+                      f"({(cur_total[key] / old_total[key] - 1) * 100:+.1f}%)")
+        if old.get("calls_per_min"):
+            print(f"  c={lvl['concurrency']:<3} calls/min: {old['calls_per_min']:.1f} -> {lvl['calls_per_min']:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark with local GPT/TTS stubs")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--repeat", type=int, default=2, help="passes over the corpus per concurrency level")
+    parser.add_argument("--durations", type=float, nargs="+", default=list(DEFAULT_DURATIONS))
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--corpus-dir", default=os.path.join(PROJECT_ROOT, "benchmarks", "fixtures"))
+    parser.add_argument("--stt", choices=["whisper", "stub"], default="whisper")
+    parser.add_argument("--gpt-latency", type=float, default=0.3, help="stub latency in seconds")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help="previous JSON result to compare against")
+    parser.add_argument("--verbose", action="store_true", help="keep pipeline logs on stdout")
+    parser.add_argument("--allow-degraded", action="store_true",
+                        help="keep a zero exit status even if some stages fell back instead of running")
+    args = parser.parse_args()
+
+    manifest = generate_corpus(args.corpus_dir, args.durations, args.seed)
+    server, base_url = start_stub_server(latency_sec=args.gpt_latency)
+    workdir = tempfile.mkdtemp(prefix="sca_bench_")
+    _configure_env(base_url, workdir)
+
+    from app.database.init_db import init_db
+    import app.main as main_module
+
+    init_db()
+    if args.stt == "stub":
+        _install_stub_stt(main_module, manifest)
+
+    # اجرای اول جداگانه اندازه‌گیری می‌شود (بارگذاری مدل‌ها و importهای تنبل)
+    warmup_start = time.perf_counter()
+    with _quiet(not args.verbose):
+        main_module.handle_processed_call(manifest[0]["path"])
+    warmup_sec = time.perf_counter() - warmup_start
+
+    levels = []
+    for concurrency in args.concurrency:
+        clips = manifest * args.repeat
+        level = _run_level(main_module.handle_processed_call, clips, concurrency, quiet=not args.verbose)
+        total = level["latency_sec"].get("total", {})
+        print(f"c={concurrency:<3} calls={level['calls']} errors={level['errors']} "
+              f"p50={total.get('p50', 0):.3f}s p95={total.get('p95', 0):.3f}s p99={total.get('p99', 0):.3f}s "
+              f"calls/min={level['calls_per_min']:.1f} process_peak_rss={level['process_peak_rss_mb']:.0f}MB"
+              + (f" degraded={level['degraded']}" if level["degraded"] else ""))
+        levels.append(level)
+
+    server.shutdown()
+    degraded: Dict[str, int] = {}
+    for level in levels:
+        for stage, count in level["degraded"].items():
+            degraded[stage] = degraded.get(stage, 0) + count
+    result = {
+        "git_commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "stt": args.stt,
+            "whisper_model": os.environ.get("WHISPER_MODEL"),
+            "gpt_latency": args.gpt_latency,
+            "durations": args.durations,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "warmup_sec": warmup_sec,
+        "valid": not degraded,
+        "degraded": degraded,
+        "levels": levels,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"📄 نتایج در {args.out} ذخیره شد")
+
+    if args.baseline:
+        _compare(result, args.baseline)
+
+    if degraded:
+        print(f"⚠️ برخی مراحل به‌جای اجرا به حالت جایگزین رفتند {degraded}؛ "
+              "زمان‌های این مراحل معتبر نیستند (وابستگی‌ها و سرورهای stub را بررسی کنید)")
+        if not args.allow_degraded:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
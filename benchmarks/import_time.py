@@ -0,0 +1,83 @@
+"""
+Cold-start import benchmark.
+
+Each entry point is imported in a fresh interpreter so nothing is cached
+between runs; reports the best and median seconds per module.
+
+    python -m benchmarks.import_time [--repeat 5] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+ENTRY_POINTS = [
+    "app.app",
+    "app.main",
+    "app.stt.transcriber",
+    "app.audio.enhancement",
+    "app.analysis.analysis",
+    "app.tts.tts_gemini",
+    "app.gpt.gpt_client",
+    "app.database.init_db",
+]
+
+_SNIPPET = (
+    "import time; t = time.perf_counter(); "
+    "import {module}; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def measure_import(module: str) -> float:
+    proc = subprocess.run(
+        [sys.executable, "-c", _SNIPPET.format(module=module)],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    return float(proc.stdout.strip().splitlines()[-1])
+
+
+def run(modules, repeat: int):
+    results = {}
+    for module in modules:
+        try:
+            samples = [measure_import(module) for _ in range(repeat)]
+            results[module] = {
+                "best_sec": min(samples),
+                "median_sec": statistics.median(samples),
+                "samples": samples,
+            }
+        except Exception as e:
+            results[module] = {"error": str(e)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import time per entry point")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", default=None)
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    args = parser.parse_args()
+
+    results = run(args.modules, args.repeat)
+    for module, r in results.items():
+        if "error" in r:
+            print(f"{module:<28} error: {r['error']}")
+        else:
+            print(f"{module:<28} best {r['best_sec']:.3f}s  median {r['median_sec']:.3f}s")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "repeat": args.repeat, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Local stand-ins for the Metis chat endpoint and Gemini TTS.
+
+Both answer with deterministic payloads after a fixed latency so benchmark
+runs measure our own code rather than the remote services.
+"""
+import base64
+import json
+import math
+import re
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+_INTENT_REPLIES = {
+    "pricing": "قیمت این محصول در حال حاضر ۲ میلیون تومان است و هزینه ارسال رایگان است.",
+    "product_availability": "بله، این کالا در انبار موجود است و در دسترس شماست.",
+    "delivery_status": "سفارش شما ارسال شده و تا دو روز کاری تحویل می‌شود.",
+    "refund": "درخواست مرجوعی ثبت شد و بازگشت وجه ظرف یک هفته انجام می‌شود.",
+    "complaint": "از مشکل پیش‌آمده متأسفیم؛ شکایت شما به پشتیبانی ارجاع شد.",
+    "faq": "ممنون از سوال شما؛ همکاران ما به‌زودی پاسخ کامل را ارسال می‌کنند.",
+}
+
+
+def _packed_reply(content: str) -> dict:
+    """Answer a batch prompt (JSON list of calls) in the JSON shape app.gpt.batch expects."""
+    from app.analysis.analysis import detect_intent, detect_sentiment_keyword
+
+    calls = json.loads(content).get("calls", [])
+    results = []
+    for call in calls:
+        intent = detect_intent(call.get("transcript", ""))
+        results.append({
+            "id": call.get("id"),
+            "sentiment": detect_sentiment_keyword(call.get("transcript", "")),
+            "intent": intent,
+            "reply": _INTENT_REPLIES.get(intent, _INTENT_REPLIES["faq"]),
+        })
+    return {"results": results}
+
+
+def _reply_for(prompt: str) -> str:
+    match = re.search(r"نیت:\s*(\w+)", prompt)
+    return _INTENT_REPLIES.get(match.group(1) if match else "faq", _INTENT_REPLIES["faq"])
+
+
+def _tone_pcm(text: str, rate: int = 24000) -> bytes:
+    """16-bit mono PCM whose length scales with the text, like real TTS output."""
+    n = int(rate * max(0.5, 0.06 * len(text)))
+    return b"".join(struct.pack("<h", int(8000 * math.sin(2 * math.pi * 220 * i / rate))) for i in range(n))
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    latency_sec = 0.0
+    pcm_cache = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        payload = self._read_json()
+        threading.Event().wait(self.latency_sec)
+        if self.path.endswith("/chat/completions"):
+            prompt = payload.get("messages", [{}])[-1].get("content", "")
+            if (payload.get("response_format") or {}).get("type") == "json_object":
+                reply = json.dumps(_packed_reply(prompt), ensure_ascii=False)
+            else:
+                reply = _reply_for(prompt)
+            self._send_json(200, {
+                "choices": [{"message": {"role": "assistant", "content": reply}}],
+                "usage": {
+                    "prompt_tokens": len(prompt.split()),
+                    "completion_tokens": len(reply.split()),
+                    "total_tokens": len(prompt.split()) + len(reply.split()),
+                },
+            })
+        elif ":generateContent" in self.path:
+            parts = payload.get("contents", [{}])[0].get("parts", [{}])
+            text = parts[0].get("text", "") if parts else ""
+            pcm = self.pcm_cache.get(text)
+            if pcm is None:
+                pcm = self.pcm_cache[text] = _tone_pcm(text)
+            self._send_json(200, {
+                "candidates": [{"content": {"role": "model", "parts": [{"inlineData": {
+                    "mimeType": "audio/L16;codec=pcm;rate=24000",
+                    "data": base64.b64encode(pcm).decode("ascii"),
+                }}]}}],
+            })
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+
+def start_stub_server(latency_sec: float = 0.0, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve both stubs on one port (ephemeral by default); returns (server, base_url)."""
+    handler = type("StubHandler", (_StubHandler,), {"latency_sec": latency_sec, "pcm_cache": {}})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the Metis/Gemini stub server in the foreground")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    srv, url = start_stub_server(args.latency, port=args.port)
+    print(f"METIS_API_URL={url}/openai/v1/chat/completions")
+    print(f"GEMINI_BASE_URL={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.shutdown()